@@ -1,12 +1,13 @@
 import streamlit as st
 import requests
 import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
 import pandas as pd
 import urllib.parse
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import re
-from typing import Dict, List, Any, Union, Optional, Tuple
+from typing import Dict, List, Any, Union, Optional, Tuple, Iterator, Iterable, AsyncIterator
 import concurrent.futures
 import numpy as np
 import plotly.express as px
@@ -18,11 +19,31 @@ import json
 from pathlib import Path
 import time
 import hashlib
+import random
+from statistics import NormalDist
+import zlib
+import sqlite3
+import os
+import shutil
+try:
+    import fcntl
+except ImportError:  # Windows: jobs are not locked
+    fcntl = None
+import uuid
+import copy
+import threading
+import weakref
+import multiprocessing
+import importlib
+import pickle
 from functools import lru_cache
+from collections import Counter, deque
 import asyncio
 import aiohttp
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, asdict, fields
 import io
+import contextlib
+import email.utils
 from PIL import Image
 import networkx as nx
 import nltk
@@ -373,6 +394,15 @@ class URLData:
     images: List[str] = field(default_factory=list)
     videos: List[str] = field(default_factory=list)
     alternates: List[Dict] = field(default_factory=list)
+    source_sitemap: Optional[str] = None  # child sitemap the URL was listed in
+    stratum: Optional[str] = None  # sampling stratum, set by StratifiedSampler
+    sample_weight: Optional[float] = None  # inverse inclusion probability
+    robots_blocked: Optional[bool] = None  # disallowed by the host's robots.txt
+    redirect_chain: List[Dict] = field(default_factory=list)  # every hop when follow_redirects is on
+    final_status_code: Optional[int] = None  # status at the end of the redirect chain
+    retry_after: Optional[float] = None  # seconds requested by a 429/503 Retry-After header
+    concurrency: Optional[int] = None  # requests allowed to the host when this URL was sent
+    attempts: List[Dict] = field(default_factory=list)  # one record per request made, retries included
     status_code: Optional[int] = None
     response_time: Optional[float] = None
     redirected: bool = False
@@ -381,14 +411,19 @@ class URLData:
     error: Optional[str] = None
     content_type: Optional[str] = None
     content_length: Optional[int] = None
+    transferred_bytes: Optional[int] = None  # body bytes actually read, never more than max_body_bytes
+    truncated: bool = False  # the body is larger than max_body_bytes, so content_length may be a lower bound
     page_title: Optional[str] = None
     meta_description: Optional[str] = None
     indexability: Optional[bool] = None
     canonical_url: Optional[str] = None
-    h1_count: Optional[int] = None
+    has_h1: Optional[bool] = None  # content analysis stops at the first H1, so H1s aren't counted
+    simhash: Optional[str] = None  # hex SimHash of the visible text, for near-duplicate detection
+    minhash: Optional[str] = None  # hex MinHash signature of the text's word shingles
     
     def to_dict(self) -> Dict:
-        return asdict(self)
+        # Shallow on purpose: asdict() would deep-copy every image/video/alternate list
+        return {name: getattr(self, name) for name in URL_FIELDS}
 
 @dataclass
 class SitemapInfo:
@@ -398,7 +433,9 @@ class SitemapInfo:
     size: Optional[int] = None
     urls_count: Optional[int] = None
     compression: Optional[str] = None  # "gzip", "none", etc.
+    compressed_size: Optional[int] = None  # bytes transferred, before decompression
     xml_format: Optional[bool] = True
+    children: List[Dict] = field(default_factory=list)  # per-child load reports for sitemap indexes
     
     def to_dict(self) -> Dict:
         return asdict(self)
@@ -412,10 +449,2048 @@ class AnalysisResult:
     keywords: Dict = field(default_factory=dict)
     performance: Dict = field(default_factory=dict)
     structure: Dict = field(default_factory=dict)
+    duplicates: Dict = field(default_factory=dict)  # near-duplicate page clusters
     
     def to_dict(self) -> Dict:
         return asdict(self)
 
+URL_FIELDS = [f.name for f in fields(URLData)]
+
+# Sitemap-level columns persisted by ParsedSitemapStore
+SITEMAP_FIELDS = ["url", "lastmod", "priority", "changefreq", "images", "videos", "alternates"]
+
+# Columns filled in by testing a URL, persisted by URLResultStore
+RESULT_FIELDS = URL_FIELDS[URL_FIELDS.index("redirect_chain"):]
+
+class URLTable:
+    """
+    Columnar table of URL records backed by a pandas DataFrame.
+    
+    This is the canonical in-memory representation of sitemap entries and
+    validation results: the parser output, the tabs, the analytics and the
+    exports all share one frame, and URLData objects are only materialized
+    as lightweight row views when the table is iterated or indexed.
+    """
+    
+    def __init__(self, frame: Optional[pd.DataFrame] = None):
+        if frame is None:
+            frame = pd.DataFrame({name: pd.Series(dtype=object) for name in URL_FIELDS})
+        self.frame = frame
+    
+    @classmethod
+    def from_urls(cls, urls: Iterable[URLData]) -> "URLTable":
+        """Build a table from URLData records without deep-copying their lists"""
+        columns = {name: [] for name in URL_FIELDS}
+        for url_data in urls:
+            for name in URL_FIELDS:
+                columns[name].append(getattr(url_data, name))
+        return cls(pd.DataFrame(columns, columns=URL_FIELDS))
+    
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List], length: int) -> "URLTable":
+        """Build a table from a subset of columns, leaving the rest empty"""
+        defaults = {field_.name: field_.default for field_ in fields(URLData)}
+        data = {}
+        for name in URL_FIELDS:
+            if name in columns:
+                data[name] = columns[name]
+            elif name in ("images", "videos", "alternates", "redirect_chain", "attempts"):
+                data[name] = [[] for _ in range(length)]
+            else:
+                data[name] = [defaults[name]] * length
+        return cls(pd.DataFrame(data, columns=URL_FIELDS))
+    
+    @classmethod
+    def concat(cls, tables: Iterable["URLTable"]) -> "URLTable":
+        frames = [table.frame for table in tables if len(table)]
+        if not frames:
+            return cls()
+        return cls(pd.concat(frames, ignore_index=True))
+    
+    def __len__(self) -> int:
+        return len(self.frame)
+    
+    def __iter__(self) -> Iterator[URLData]:
+        columns = [self.values(name) for name in URL_FIELDS]
+        for row in zip(*columns):
+            yield URLData(*row)
+    
+    def __getitem__(self, key: Union[int, slice]) -> Union[URLData, "URLTable"]:
+        if isinstance(key, slice):
+            return URLTable(self.frame.iloc[key])
+        return next(iter(URLTable(self.frame.iloc[[key]])))
+    
+    def values(self, name: str) -> List:
+        """Column values as a Python list with missing values normalized to None"""
+        series = self.frame[name]
+        values = series.tolist()
+        if series.dtype != object or series.hasnans:
+            values = [None if _is_missing(value) else value for value in values]
+        return values
+    
+    def numeric(self, name: str) -> np.ndarray:
+        """Numeric values of a column with non-numeric entries dropped"""
+        return pd.to_numeric(self.frame[name], errors="coerce").dropna().to_numpy(dtype=float)
+    
+    def list_lengths(self, name: str) -> np.ndarray:
+        """Length of the list stored in each row of a list column"""
+        return self.frame[name].map(len).to_numpy(dtype=np.int64)
+    
+    def status_counts(self) -> Dict[str, int]:
+        counts = self.frame["status_group"].value_counts()
+        return {group: int(counts.get(group, 0)) for group in ("2xx", "3xx", "4xx", "5xx", "error")}
+    
+    def to_json(self) -> str:
+        return self.frame.to_json(orient="records")
+    
+    def to_sitemap_arrays(self) -> Dict[str, np.ndarray]:
+        """Pack the SITEMAP_FIELDS columns into flat arrays for ParsedSitemapStore"""
+        columns, offsets = {}, {}
+        for name in SITEMAP_FIELDS:
+            values = self.values(name)
+            if name == "alternates":
+                alternates = [alternate for row in values for alternate in row]
+                columns["alternate_href"] = [alternate.get("href") for alternate in alternates]
+                columns["alternate_hreflang"] = [alternate.get("hreflang") for alternate in alternates]
+            elif name in ("images", "videos"):
+                columns[name] = [item for row in values for item in row]
+            else:
+                columns[name] = values
+                continue
+            offsets[f"{name}.lists"] = _list_offsets(values)
+        arrays = _pack_columns(columns)
+        arrays.update(offsets)
+        return arrays
+    
+    @classmethod
+    def from_sitemap_arrays(cls, arrays) -> "URLTable":
+        """Inverse of to_sitemap_arrays"""
+        columns = {}
+        for name in SITEMAP_FIELDS:
+            if name == "alternates":
+                items = [
+                    {"href": href, "hreflang": hreflang}
+                    for href, hreflang in zip(_unpack_column(arrays, "alternate_href"), _unpack_column(arrays, "alternate_hreflang"))
+                ]
+            else:
+                items = _unpack_column(arrays, name)
+            columns[name] = _split_lists(items, arrays[f"{name}.lists"]) if f"{name}.lists" in arrays else items
+        return cls.from_columns(columns, len(columns["url"]))
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+def _clean_url(url: str) -> str:
+    """Drop surrounding whitespace and the fragment, so URL variants compare equal"""
+    return url.strip().split("#", 1)[0]
+
+def _local_name(tag: str) -> str:
+    """Strip the '{namespace}' prefix from an ElementTree tag"""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ""
+
+class SitemapStreamParser:
+    """
+    Incremental sitemap parser built on ElementTree's pull parser.
+    
+    Bytes (or text) are pushed in with feed() and every completed <url> or
+    <sitemap> entry is returned as a URLData record. Processed elements are
+    cleared straight away, so memory stays flat regardless of sitemap size.
+    Raises ET.ParseError on malformed XML.
+    """
+    
+    ENTRY_TAGS = ("url", "sitemap")
+    
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root = None
+        self._depth = 0
+        self.type = "unknown"  # "index" or "sitemap" once the root element is seen
+        self.entries_count = 0
+    
+    def feed(self, data: Union[bytes, str]) -> List[URLData]:
+        """Push a chunk of the document and return the entries it completed"""
+        self._parser.feed(data)
+        return self._drain()
+    
+    def close(self) -> List[URLData]:
+        """Signal the end of the document and return any remaining entries"""
+        self._parser.close()
+        return self._drain()
+    
+    def _drain(self) -> List[URLData]:
+        entries = []
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                self._depth += 1
+                if self._root is None:
+                    self._root = elem
+                    root_tag = _local_name(elem.tag)
+                    self.type = {"urlset": "sitemap", "sitemapindex": "index"}.get(root_tag, "unknown")
+                continue
+            
+            self._depth -= 1
+            # Entries are the direct children of <urlset> / <sitemapindex>
+            if self._depth == 1 and _local_name(elem.tag) in self.ENTRY_TAGS:
+                url_data = self._build_entry(elem)
+                # Release the subtree and detach everything parsed so far from the root
+                elem.clear()
+                self._root.clear()
+                if url_data:
+                    self.entries_count += 1
+                    entries.append(url_data)
+        return entries
+    
+    @staticmethod
+    def _child_text(elem, name: str) -> Optional[str]:
+        for child in elem:
+            if _local_name(child.tag) == name:
+                return (child.text or "").strip() or None
+        return None
+    
+    def _build_entry(self, elem) -> Optional[URLData]:
+        url_data = URLData(url="")
+        for child in elem:
+            name = _local_name(child.tag)
+            if name == "loc":
+                url_data.url = (child.text or "").strip()
+            elif name == "lastmod":
+                url_data.lastmod = (child.text or "").strip() or None
+            elif name == "priority":
+                url_data.priority = (child.text or "").strip() or None
+            elif name == "changefreq":
+                url_data.changefreq = (child.text or "").strip() or None
+            elif name == "image":
+                image_loc = self._child_text(child, "loc")
+                if image_loc:
+                    url_data.images.append(image_loc)
+            elif name == "video":
+                content_loc = self._child_text(child, "content_loc")
+                if content_loc:
+                    url_data.videos.append(content_loc)
+            elif name == "link":
+                url_data.alternates.append({"href": child.get("href"), "hreflang": child.get("hreflang")})
+        return url_data if url_data.url else None
+
+# Size of the network chunks fed to the streaming parser
+SITEMAP_CHUNK_SIZE = 64 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+class GzipStreamDecoder:
+    """
+    Incremental gzip decompressor for sitemap bodies.
+    
+    The gzip magic bytes are sniffed from the first chunk, so plain XML passes
+    through untouched while `.xml.gz` files and gzip transfer encoding are
+    inflated chunk by chunk. A `.xml.gz` file served with
+    `Content-Encoding: gzip` is compressed twice and is unwrapped layer by layer.
+    """
+    
+    def __init__(self, max_layers: int = 2):
+        self._max_layers = max_layers
+        self._pending = b""
+        self._decompressor = None  # None until sniffed, False for plain data
+        self._inner = None
+        self.compressed = False
+    
+    def decompress(self, data: bytes) -> bytes:
+        """Return the decompressed bytes available after feeding `data`"""
+        if self._decompressor is None:
+            self._pending += data
+            if len(self._pending) < len(GZIP_MAGIC):
+                return b""
+            data, self._pending = self._pending, b""
+            if data.startswith(GZIP_MAGIC):
+                self.compressed = True
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if self._max_layers > 1:
+                    self._inner = GzipStreamDecoder(self._max_layers - 1)
+            else:
+                self._decompressor = False
+        
+        if self._decompressor is False:
+            return data
+        
+        output = self._decompress_members(data)
+        return self._inner.decompress(output) if self._inner else output
+    
+    def flush(self) -> bytes:
+        """Return whatever is left once the input is exhausted"""
+        if self._decompressor is None:
+            data, self._pending = self._pending, b""
+            return data
+        if self._decompressor is False:
+            return b""
+        output = self._decompressor.flush()
+        if self._inner:
+            output = self._inner.decompress(output) + self._inner.flush()
+        return output
+    
+    def _decompress_members(self, data: bytes) -> bytes:
+        # A gzip file may hold several concatenated members
+        output = []
+        while data:
+            output.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            data = self._decompressor.unused_data
+            if not data.startswith(GZIP_MAGIC):
+                break  # Trailing padding after the last member
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b"".join(output)
+
+class HeadExtractor(HTMLParser):
+    """
+    Streaming extractor for the page fields used by content analysis.
+    
+    HTML is pushed in with feed() and only the title, meta description,
+    robots meta, canonical link and H1 tags are looked at; no tree is built.
+    Pages are only read up to their first H1 (see `_read_head`), so only
+    whether the page has an H1 is known (`has_h1`), not how many. With
+    `collect_text`, the visible body text is gathered in `text_parts` too.
+    """
+    
+    INVISIBLE_TAGS = ("script", "style", "noscript", "template", "svg")
+    
+    def __init__(self, collect_text: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.collect_text = collect_text
+        self.text_parts = []
+        self._in_body = False
+        self._hidden = 0
+        self.page_title = None
+        self.meta_description = None
+        self.robots = None
+        self.canonical_url = None
+        self.has_h1 = False
+        self._in_title = False
+        self._title_parts = []
+    
+    @property
+    def indexability(self) -> bool:
+        return not (self.robots and "noindex" in self.robots.lower())
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in self.INVISIBLE_TAGS:
+            self._hidden += 1
+        elif tag == "body":
+            self._in_body = True
+        if tag == "title" and self.page_title is None:
+            self._in_title = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            name = (attrs.get("name") or "").lower()
+            if name == "description" and self.meta_description is None:
+                self.meta_description = attrs.get("content")
+            elif name == "robots" and self.robots is None:
+                self.robots = attrs.get("content")
+        elif tag == "link" and self.canonical_url is None:
+            attrs = dict(attrs)
+            if "canonical" in (attrs.get("rel") or "").lower().split():
+                self.canonical_url = attrs.get("href")
+        elif tag == "h1":
+            self.has_h1 = True
+    
+    def handle_endtag(self, tag):
+        if tag in self.INVISIBLE_TAGS:
+            self._hidden = max(0, self._hidden - 1)
+        elif tag == "head":
+            self._in_body = True
+        if tag == "title" and self._in_title:
+            self._in_title = False
+            self.page_title = "".join(self._title_parts)
+    
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+        elif self.collect_text and self._in_body and not self._hidden:
+            self.text_parts.append(data)
+    
+    def close(self):
+        super().close()
+        if self._in_title:  # the byte budget ran out inside <title>
+            self._in_title = False
+            self.page_title = "".join(self._title_parts)
+
+# Cheap byte-level check for when a page has been read far enough to analyze
+HEAD_END = re.compile(rb"</head|<body", re.IGNORECASE)
+H1_END = re.compile(rb"</h1", re.IGNORECASE)
+
+# Page fingerprints for near-duplicate detection
+MINHASH_PERMUTATIONS = 64
+MINHASH_PRIME = 4294967311  # smallest prime above 2**32
+SHINGLE_SIZE = 5  # words per shingle
+_minhash_rng = np.random.default_rng(20240501)  # fixed, so signatures compare across runs
+MINHASH_A = _minhash_rng.integers(1, 2**32 - 1, MINHASH_PERMUTATIONS, dtype=np.uint64)
+MINHASH_B = _minhash_rng.integers(0, 2**32 - 1, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def page_fingerprints(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    SimHash and MinHash fingerprints of a page's visible text, as hex strings
+    
+    The SimHash is a 64-bit hash of the word counts, where similar pages
+    differ in few bits. The MinHash signature holds MINHASH_PERMUTATIONS
+    32-bit minima over hashed word shingles; the share of equal positions
+    estimates the Jaccard similarity of two pages' shingle sets.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None, None
+    
+    counts = Counter(words)
+    hashes = np.array([int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little") for word in counts], dtype=np.uint64)
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little").astype(np.int64)
+    weights = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    votes = (2 * bits - 1).T @ weights
+    simhash = int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+    
+    size = min(SHINGLE_SIZE, len(words))
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    shingle_hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    signature = ((np.outer(MINHASH_A, shingle_hashes) + MINHASH_B[:, None]) % MINHASH_PRIME).min(axis=1).astype(np.uint32)
+    return f"{simhash:016x}", signature.tobytes().hex()
+
+def extract_page_fields(data: bytes, charset: Optional[str] = None, fingerprint: bool = False) -> Dict[str, Any]:
+    """Parse the start of an HTML page into the content analysis fields"""
+    try:
+        html = data.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        html = data.decode("utf-8", errors="replace")
+    extractor = HeadExtractor(collect_text=fingerprint)
+    extractor.feed(html)
+    extractor.close()
+    page = {
+        "page_title": extractor.page_title,
+        "meta_description": extractor.meta_description,
+        "indexability": extractor.indexability,
+        "canonical_url": extractor.canonical_url,
+        "has_h1": extractor.has_h1
+    }
+    if fingerprint:
+        page["simhash"], page["minhash"] = page_fingerprints(" ".join(extractor.text_parts))
+    return page
+
+class DuplicateIndex:
+    """
+    Locality-sensitive hashing over page fingerprints.
+    
+    MinHash signatures are cut into `bands` bands and SimHashes into four
+    16-bit blocks; pages sharing a band or a block land in the same bucket.
+    Each bucket member is checked against the bucket's first page only
+    (estimated Jaccard >= `jaccard`, or SimHash Hamming distance <=
+    `max_distance`, which always shares a block), and the accepted links are
+    merged into clusters. Every step is a sort or a vectorized comparison, so
+    the cost grows near-linearly with the number of pages.
+    """
+    
+    SIMHASH_BLOCKS = 4
+    
+    def __init__(self, bands: int = 16, jaccard: float = 0.7, max_distance: int = 3):
+        self.bands = bands
+        self.jaccard = jaccard
+        self.max_distance = max_distance
+    
+    @staticmethod
+    def _bucket_links(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(member, first member) pairs for every bucket of equal keys"""
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        first = order[np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))]
+        linked = ~starts
+        return order[linked], first[linked]
+    
+    def clusters(self, simhashes: List[Optional[str]], minhashes: List[Optional[str]]) -> List[List[int]]:
+        """Groups of row positions whose pages are near-duplicates, largest first"""
+        rows = np.array([i for i, (simhash, minhash) in enumerate(zip(simhashes, minhashes)) if simhash and minhash], dtype=np.int64)
+        if len(rows) < 2:
+            return []
+        sims = np.array([int(simhashes[i], 16) for i in rows], dtype=np.uint64)
+        signatures = np.frombuffer(bytes.fromhex("".join(minhashes[i] for i in rows)), dtype=np.uint32).reshape(len(rows), -1)
+        
+        links = []
+        band_width = signatures.shape[1] // self.bands
+        for band in range(self.bands):
+            block = np.ascontiguousarray(signatures[:, band * band_width:(band + 1) * band_width])
+            keys = np.unique(block.view(np.dtype((np.void, block.dtype.itemsize * band_width))).ravel(), return_inverse=True)[1]
+            member, first = self._bucket_links(keys.ravel())
+            similar = (signatures[member] == signatures[first]).mean(axis=1) >= self.jaccard
+            links.append((member[similar], first[similar]))
+        for block in range(self.SIMHASH_BLOCKS):
+            member, first = self._bucket_links((sims >> np.uint64(16 * block)) & np.uint64(0xFFFF))
+            distance = np.unpackbits((sims[member] ^ sims[first]).view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+            similar = distance <= self.max_distance
+            links.append((member[similar], first[similar]))
+        
+        # Connected components by label propagation over the accepted links
+        a = np.concatenate([member for member, _ in links])
+        b = np.concatenate([first for _, first in links])
+        labels = np.arange(len(rows))
+        while True:
+            smallest = np.minimum(labels[a], labels[b])
+            updated = labels.copy()
+            np.minimum.at(updated, a, smallest)
+            np.minimum.at(updated, b, smallest)
+            updated = updated[updated]  # pointer jumping
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+        
+        groups = {}
+        for position, label in enumerate(labels):
+            groups.setdefault(label, []).append(int(rows[position]))
+        return sorted((group for group in groups.values() if len(group) > 1), key=len, reverse=True)
+
+class HTMLAnalysisPool:
+    """
+    Process pool for HTML analysis, so parsing never stalls the event loop.
+    
+    Pages go to `workers` processes (one per core by default) and each event
+    loop may have at most `max_pending` pages submitted at a time; callers
+    beyond that wait, which keeps downloaded-but-unparsed pages bounded.
+    If the pool can't be started or breaks, pages are parsed inline instead.
+    Workers are started from a forkserver rather than forked, since forking
+    the multi-threaded Streamlit server can leave children holding locks.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 2
+        self.inline = False
+        self._executor = None
+        self._lock = threading.Lock()  # script and job runner threads may start the pool at once
+        self._function = extract_page_fields
+        self._slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+    
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                if __name__ == "__main__":
+                    # Streamlit runs this file as __main__ and redefines its functions on
+                    # every rerun, so they can't be pickled by reference; hand the pool
+                    # the copy from this file imported as a regular module instead
+                    self._function = importlib.import_module(Path(__file__).stem).extract_page_fields
+                context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+                self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=context)
+            return self._executor
+    
+    async def analyze(self, data: bytes, charset: Optional[str] = None, fingerprint: bool = False) -> Dict[str, Any]:
+        """Content analysis fields for the page start in `data`"""
+        if self.inline:
+            return extract_page_fields(data, charset, fingerprint)
+        loop = asyncio.get_running_loop()
+        if loop not in self._slots:
+            self._slots[loop] = asyncio.Semaphore(self.max_pending)
+        async with self._slots[loop]:
+            try:
+                return await loop.run_in_executor(self._get_executor(), self._function, data, charset, fingerprint)
+            except (concurrent.futures.process.BrokenProcessPool, pickle.PicklingError, ImportError, OSError):
+                self.inline = True
+                return extract_page_fields(data, charset, fingerprint)
+
+@st.cache_resource
+def get_html_pool() -> HTMLAnalysisPool:
+    """The HTMLAnalysisPool shared by all sessions of this server"""
+    return HTMLAnalysisPool()
+
+@dataclass
+class CachedResponse:
+    """Minimal stand-in for requests.Response returned by HTTPCache.get"""
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    from_cache: bool = False
+    
+    @property
+    def text(self) -> str:
+        charset = re.search(r"charset=([\w-]+)", self.headers.get("Content-Type", ""), re.I)
+        try:
+            return self.content.decode(charset.group(1) if charset else "utf-8", errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+class HTTPCache:
+    """
+    Disk-backed HTTP cache with ETag / Last-Modified revalidation.
+    
+    Each URL is stored as a `<sha256>.body` file holding the response body as
+    received, plus a `<sha256>.json` file with the validators and a few
+    headers. Requests for cached URLs are sent conditionally and a
+    `304 Not Modified` is answered from disk, so unchanged sitemaps and
+    robots.txt files cost a round trip instead of a full download, even
+    after an app restart. Once the cache holds more than `max_bytes`, the
+    least recently used entries are deleted.
+    """
+    
+    STORED_HEADERS = ("Content-Type", "Content-Encoding", "ETag", "Last-Modified")
+    
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+    
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+    
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Return the cache metadata for `url`, or None when nothing usable is stored"""
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or not body_path.exists():
+            return None
+        _touch(body_path)
+        return meta
+    
+    def conditional_headers(self, meta: Optional[Dict]) -> Dict[str, str]:
+        """Validators to send with a request for a cached entry"""
+        if not meta:
+            return {}
+        headers = {}
+        if meta["headers"].get("ETag"):
+            headers["If-None-Match"] = meta["headers"]["ETag"]
+        if meta["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+        return headers
+    
+    def iter_body(self, url: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield the stored body of `url` in chunks"""
+        _, body_path = self._paths(url)
+        with open(body_path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def read_body(self, url: str) -> bytes:
+        _, body_path = self._paths(url)
+        return body_path.read_bytes()
+    
+    def revalidated(self, url: str, meta: Dict, headers) -> Dict:
+        """Record a 304 response, picking up any refreshed validators"""
+        for name in ("ETag", "Last-Modified"):
+            if headers.get(name):
+                meta["headers"][name] = headers[name]
+        meta["validated_at"] = time.time()
+        self._write_meta(url, meta)
+        return meta
+    
+    def writer(self, url: str) -> "HTTPCacheWriter":
+        """Start storing a response body that arrives in chunks"""
+        _, body_path = self._paths(url)
+        return HTTPCacheWriter(self, url, body_path)
+    
+    def store(self, url: str, headers, content: bytes) -> Dict:
+        """Store a complete response body"""
+        writer = self.writer(url)
+        writer.write(content)
+        return writer.commit(headers)
+    
+    def invalidate(self, url: str):
+        for path in self._paths(url):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+    
+    def clear(self):
+        for path in self.directory.iterdir():
+            if path.suffix in (".json", ".body", ".tmp"):
+                path.unlink(missing_ok=True)
+    
+    def prune(self):
+        """Delete the least recently used entries until the cache fits in `max_bytes`"""
+        for body_path in _lru_overflow(self.directory.glob("*.body"), self.max_bytes):
+            body_path.unlink(missing_ok=True)
+            body_path.with_suffix(".json").unlink(missing_ok=True)
+    
+    def _write_meta(self, url: str, meta: Dict):
+        meta_path, _ = self._paths(url)
+        tmp_path = meta_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, meta_path)
+    
+    def get(self, url: str, headers: Dict[str, str], timeout: float, max_age: Optional[float] = None) -> CachedResponse:
+        """Conditional GET through `requests`, answering 304s from disk
+        
+        With `max_age`, an entry validated less than `max_age` seconds ago is
+        returned without contacting the server at all.
+        """
+        meta = self.lookup(url)
+        if meta and max_age and time.time() - meta["validated_at"] < max_age:
+            return CachedResponse(200, meta["headers"], self.read_body(url), from_cache=True)
+        request_headers = dict(headers, **self.conditional_headers(meta))
+        response = requests.get(url, headers=request_headers, timeout=timeout)
+        
+        if response.status_code == 304 and meta:
+            meta = self.revalidated(url, meta, response.headers)
+            return CachedResponse(200, meta["headers"], self.read_body(url), from_cache=True)
+        
+        if response.status_code == 200:
+            # requests has already undone any transfer encoding
+            stored_headers = requests.structures.CaseInsensitiveDict(response.headers)
+            stored_headers.pop("Content-Encoding", None)
+            self.store(url, stored_headers, response.content)
+        elif response.status_code in (404, 410):
+            self.invalidate(url)
+        
+        return CachedResponse(response.status_code, response.headers, response.content)
+
+class HTTPCacheWriter:
+    """Write a response body to a temporary file and publish it atomically on commit"""
+    
+    def __init__(self, cache: HTTPCache, url: str, body_path: Path):
+        self.cache = cache
+        self.url = url
+        self.body_path = body_path
+        self.tmp_path = body_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        self._file = open(self.tmp_path, "wb")
+        self._digest = hashlib.sha256()
+        self.size = 0
+    
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+    
+    def commit(self, headers) -> Dict:
+        self._file.close()
+        os.replace(self.tmp_path, self.body_path)
+        meta = {
+            "url": self.url,
+            "headers": {name: headers[name] for name in HTTPCache.STORED_HEADERS if headers.get(name)},
+            "size": self.size,
+            "sha256": self._digest.hexdigest(),
+            "stored_at": time.time(),
+            "validated_at": time.time()
+        }
+        self.cache._write_meta(self.url, meta)
+        self.cache.prune()
+        return meta
+    
+    def discard(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+def _touch(path: Path):
+    """Mark a cache file as used, for least-recently-used pruning"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def _lru_overflow(paths: Iterable[Path], max_bytes: int) -> List[Path]:
+    """The least recently used of `paths` that have to go for the rest to fit in `max_bytes`"""
+    entries = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    overflow = []
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_bytes:
+            break
+        overflow.append(path)
+        total -= size
+    return overflow
+
+def _pack_strings(values: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Encode strings Arrow-style as one UTF-8 buffer, an offsets array and a validity mask"""
+    encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    valid = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+    return data, offsets, valid
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray, valid: np.ndarray) -> List[Optional[str]]:
+    """Inverse of _pack_strings"""
+    blob = data.tobytes()
+    bounds = offsets.tolist()
+    text = blob.decode("utf-8")
+    # For pure ASCII buffers byte offsets are character offsets, so slice the decoded text directly
+    source, decode = (text, False) if len(text) == len(blob) else (blob, True)
+    values = []
+    for i, is_valid in enumerate(valid.tolist()):
+        if not is_valid:
+            values.append(None)
+            continue
+        value = source[bounds[i]:bounds[i + 1]]
+        values.append(value.decode("utf-8") if decode else value)
+    return values
+
+def _pack_columns(columns: Dict[str, List[Optional[str]]]) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for name, values in columns.items():
+        arrays[f"{name}.data"], arrays[f"{name}.offsets"], arrays[f"{name}.valid"] = _pack_strings(values)
+    return arrays
+
+def _unpack_column(arrays, name: str) -> List[Optional[str]]:
+    return _unpack_strings(arrays[f"{name}.data"], arrays[f"{name}.offsets"], arrays[f"{name}.valid"])
+
+def _list_offsets(lists: List[List]) -> np.ndarray:
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in lists], out=offsets[1:])
+    return offsets
+
+def _split_lists(values: List, offsets: np.ndarray) -> List[List]:
+    bounds = offsets.tolist()
+    return [values[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+class ParsedSitemapStore:
+    """
+    Content-addressed store of parsed sitemaps.
+    
+    Entries are keyed by the SHA-256 of the raw sitemap bytes (computed while
+    the body is downloaded) and saved as `.npz` files of flat columnar arrays:
+    strings use an Arrow-like UTF-8 buffer + offsets layout and the image,
+    video and alternate lists are flattened with list offsets. Loading is
+    pickle-free and avoids re-parsing XML for documents seen before. Once
+    the store holds more than `max_bytes`, the least recently used entries
+    are deleted.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+    
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.npz"
+    
+    def get(self, digest: Optional[str]) -> Optional[Tuple["URLTable", Dict]]:
+        """Return the stored URL table and sitemap metadata for `digest`, if any"""
+        if not digest:
+            return None
+        try:
+            with np.load(self._path(digest), allow_pickle=False) as arrays:
+                meta = json.loads(arrays["meta"].tobytes().decode("utf-8"))
+                if meta.get("version") != self.VERSION:
+                    return None
+                table = URLTable.from_sitemap_arrays(arrays)
+        except (OSError, KeyError, ValueError):
+            return None
+        _touch(self._path(digest))
+        return table, meta
+    
+    def put(self, digest: Optional[str], table: "URLTable", meta: Dict):
+        """Store a parsed URL table with a small metadata dict (sitemap type, sizes)"""
+        if not digest:
+            return
+        arrays = table.to_sitemap_arrays()
+        arrays["meta"] = np.frombuffer(json.dumps(dict(meta, version=self.VERSION)).encode("utf-8"), dtype=np.uint8)
+        
+        path = self._path(digest)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp.npz")
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        for stale in _lru_overflow(self.directory.glob("*.npz"), self.max_bytes):
+            stale.unlink(missing_ok=True)
+    
+    def discard(self, digest: Optional[str]):
+        """Delete the entry for a document that has been replaced"""
+        if digest:
+            self._path(digest).unlink(missing_ok=True)
+    
+    def clear(self):
+        for path in self.directory.glob("*.npz"):
+            path.unlink(missing_ok=True)
+
+class URLResultStore:
+    """
+    Persistent per-URL store of the latest test result.
+    
+    One SQLite row per URL holds the result columns as a JSON array, the time
+    the URL was checked and the sitemap <lastmod> seen at that time, so an
+    incremental run only needs to retest URLs that are new, whose lastmod
+    changed, or whose result is older than the freshness window. The table is
+    rebuilt when RESULT_FIELDS changes. A connection is opened per call
+    because Streamlit reruns the script on different threads.
+    """
+    
+    BATCH_SIZE = 10000
+    SCHEMA_VERSION = int(hashlib.sha256(",".join(RESULT_FIELDS).encode("utf-8")).hexdigest()[:7], 16)
+    _encode = json.JSONEncoder(default=str, separators=(",", ":")).encode
+    
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection, connection:
+            if connection.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                connection.execute("DROP TABLE IF EXISTS results")
+                connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "url TEXT PRIMARY KEY, lastmod TEXT, checked_at REAL NOT NULL, result TEXT NOT NULL)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        return contextlib.closing(sqlite3.connect(self.path))
+    
+    def save(self, results: "URLTable", checked_at: Optional[float] = None):
+        """Record (or replace) the results of a test run"""
+        checked_at = checked_at or time.time()
+        columns = [results.values(name) for name in RESULT_FIELDS]
+        rows = (
+            (url, lastmod, checked_at, self._encode(values))
+            for url, lastmod, *values in zip(results.values("url"), results.values("lastmod"), *columns)
+        )
+        with self._connect() as connection, connection:
+            connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+    
+    def plan(self, urls: "URLTable", max_age: float) -> Tuple[np.ndarray, "URLTable"]:
+        """
+        Split `urls` into those to retest and those with a usable stored result
+        
+        Returns a boolean mask of the URLs to retest and a table of the other
+        URLs with their stored result columns filled in.
+        """
+        wanted = urls.values("url")
+        stored = {}
+        with self._connect() as connection:
+            # Join against a temporary table so millions of URLs cost one query per batch
+            connection.execute("CREATE TEMP TABLE wanted (url TEXT PRIMARY KEY)")
+            for start in range(0, len(wanted), self.BATCH_SIZE):
+                connection.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((url,) for url in wanted[start:start + self.BATCH_SIZE]))
+            for url, lastmod, checked_at, result in connection.execute(
+                "SELECT r.url, r.lastmod, r.checked_at, r.result FROM results r JOIN wanted USING (url)"
+            ):
+                stored[url] = (lastmod, checked_at, result)
+        
+        oldest = time.time() - max_age
+        retest = np.ones(len(wanted), dtype=bool)
+        for i, (url, lastmod) in enumerate(zip(wanted, urls.values("lastmod"))):
+            entry = stored.get(url)
+            if entry and entry[0] == lastmod and entry[1] >= oldest:
+                retest[i] = False
+        
+        cached = urls.frame[~retest].copy()
+        # One decode for the whole selection instead of one per row
+        records = json.loads("[" + ",".join(stored[url][2] for url in cached["url"]) + "]")
+        columns = list(zip(*records)) or [()] * len(RESULT_FIELDS)
+        for name, values in zip(RESULT_FIELDS, columns):
+            cached[name] = pd.Series(values, index=cached.index, dtype=object)
+        return retest, URLTable(cached)
+    
+    def clear(self):
+        with self._connect() as connection, connection:
+            connection.execute("DELETE FROM results")
+
+class ValidationJob:
+    """
+    A validation run checkpointed to disk so it can be resumed by job ID.
+    
+    Each job lives in `<root>/<job_id>/`: `job.json` holds the metadata,
+    `urls.jsonl` the URLs to test and `results.jsonl` an append-only log of
+    completed results. Results are appended in batches, one JSON array per
+    line, and fsynced, so a rerun or restart loses at most the batch in
+    progress; a torn last line is cut off when the job is locked to resume
+    it. Jobs carry an `owner` so each user only sees their own, and a job
+    is locked while it runs so it can't be resumed twice at once. A job's
+    directory is deleted once its results have been displayed; completed
+    jobs nobody collected are pruned after `max_age`.
+    """
+    
+    CHECKPOINT_EVERY = 500
+    _encode = json.JSONEncoder(default=str, separators=(",", ":")).encode
+    
+    def __init__(self, root: Union[str, Path], job_id: str):
+        self.job_id = job_id
+        self.directory = Path(root) / job_id
+        self.meta = json.loads((self.directory / "job.json").read_text())
+        self._lock_file = None
+    
+    @classmethod
+    def create(cls, root: Union[str, Path], urls: "URLTable", **meta) -> "ValidationJob":
+        """Persist `urls` as a new job; `meta` is stored alongside (sitemap URL, sample design)"""
+        job_id = uuid.uuid4().hex[:12]
+        directory = Path(root) / job_id
+        directory.mkdir(parents=True)
+        cls._write_rows(directory / "urls.jsonl", urls)
+        (directory / "results.jsonl").touch()
+        meta = dict(meta, job_id=job_id, created_at=datetime.now().isoformat(), total=len(urls), status="running", fields=URL_FIELDS)
+        (directory / "job.json").write_text(json.dumps(meta))
+        return cls(root, job_id)
+    
+    @classmethod
+    def list_jobs(cls, root: Union[str, Path], owner: Optional[str] = None) -> List[Dict]:
+        """Metadata of the jobs under `root` (only `owner`'s, if given), newest first, with a `completed` count"""
+        jobs = []
+        for path in Path(root).glob("*/job.json"):
+            try:
+                meta = json.loads(path.read_text())
+                if owner is not None and meta.get("owner") != owner:
+                    continue
+                meta["completed"] = meta["total"]
+                if meta["status"] != "complete":
+                    with open(path.parent / "results.jsonl", "rb") as log:
+                        meta["completed"] = sum(chunk.count(b"\n") for chunk in iter(lambda: log.read(1 << 20), b""))
+            except (OSError, ValueError, KeyError):
+                continue
+            jobs.append(meta)
+        return sorted(jobs, key=lambda meta: meta["created_at"], reverse=True)
+    
+    @staticmethod
+    def remove(root: Union[str, Path], job_id: str):
+        """Delete a job and its logs"""
+        shutil.rmtree(Path(root) / job_id, ignore_errors=True)
+    
+    @classmethod
+    def prune(cls, root: Union[str, Path], max_age: float):
+        """Delete completed jobs created more than `max_age` seconds ago; unfinished jobs are kept for resuming"""
+        cutoff = datetime.fromtimestamp(time.time() - max_age).isoformat()
+        for path in Path(root).glob("*/job.json"):
+            try:
+                meta = json.loads(path.read_text())
+                if meta["status"] == "complete" and meta["created_at"] < cutoff:
+                    cls.remove(root, path.parent.name)
+            except (OSError, ValueError, KeyError):
+                continue
+    
+    @classmethod
+    def _write_rows(cls, path: Path, rows: Iterable[URLData], mode: str = "w"):
+        lines = "".join(cls._encode([getattr(url_data, name) for name in URL_FIELDS]) + "\n" for url_data in rows)
+        with open(path, mode, encoding="utf-8") as out:
+            out.write(lines)
+            out.flush()
+            os.fsync(out.fileno())
+    
+    def _drop_torn_tail(self):
+        """Cut a partially written last line so new batches start on a fresh line"""
+        with open(self.directory / "results.jsonl", "r+b") as log:
+            end = log.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                log.seek(start)
+                newline = log.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                log.truncate(position)
+    
+    def _read_rows(self, path: Path) -> "URLTable":
+        text = path.read_text(encoding="utf-8")
+        lines = text.split("\n")
+        lines.pop()  # empty after the final newline, or a torn write
+        records = json.loads("[" + ",".join(lines) + "]")
+        columns = dict(zip(self.meta["fields"], map(list, zip(*records))))
+        return URLTable.from_columns({name: values for name, values in columns.items() if name in URL_FIELDS}, len(records))
+    
+    def urls(self) -> "URLTable":
+        return self._read_rows(self.directory / "urls.jsonl")
+    
+    def results(self) -> "URLTable":
+        """Every result checkpointed so far"""
+        return self._read_rows(self.directory / "results.jsonl")
+    
+    def remaining(self) -> "URLTable":
+        """URLs of the job without a checkpointed result"""
+        urls = self.urls()
+        done = set(self.results().values("url"))
+        return URLTable(urls.frame[~urls.frame["url"].isin(done)].reset_index(drop=True))
+    
+    def checkpoint(self, rows: Iterable[URLData]):
+        """Append a batch of completed results to the log"""
+        self._write_rows(self.directory / "results.jsonl", rows, mode="a")
+    
+    def lock(self) -> bool:
+        """Take the job for running; False if another run holds it"""
+        if self._lock_file is None:
+            self._lock_file = open(self.directory / "lock", "w")
+            if fcntl:
+                try:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self._lock_file.close()
+                    self._lock_file = None
+                    return False
+            self._drop_torn_tail()
+        return True
+    
+    def unlock(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def finish(self):
+        self.meta["status"] = "complete"
+        (self.directory / "job.json").write_text(json.dumps(self.meta))
+    
+    def delete(self):
+        self.unlock()
+        self.remove(self.directory.parent, self.job_id)
+
+@dataclass
+class BackgroundJob:
+    """Live state of a ValidationJob queued on the JobRunner"""
+    job: ValidationJob
+    total: int
+    status: str = "queued"  # queued, running, complete, cancelled or failed
+    tested: int = 0
+    reused: int = 0
+    error: Optional[str] = None
+    recent: deque = field(default_factory=lambda: deque(maxlen=100))  # the full results are in the job log
+    status_counts: Counter = field(default_factory=Counter)
+    host_stats: Dict = field(default_factory=dict)
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    stopped_at: Optional[float] = None
+    
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+    
+    def record(self, url_data: URLData):
+        self.recent.append(url_data)
+        self.status_counts[url_data.status_group] += 1
+        self.tested += 1
+
+class JobRunner:
+    """
+    Runs validation jobs on a thread pool, off the Streamlit script thread.
+    
+    Jobs wait in the pool's queue until a worker is free, report progress
+    through their BackgroundJob, and can be cancelled while queued or
+    running; a cancelled job keeps its checkpoints and can be resumed. One
+    runner is shared by every session (see get_job_runner), so concurrent
+    users queue behind each other instead of competing for the process.
+    Stopped jobs are dropped after `HANDLE_TTL` seconds even if the session
+    that started them never collects them.
+    """
+    
+    HANDLE_TTL = 3600
+    
+    def __init__(self, workers: int = 2):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="validation-job")
+        self.jobs = {}  # job_id -> BackgroundJob
+    
+    def submit(self, validator: "SitemapValidator", job: ValidationJob) -> BackgroundJob:
+        """Queue `job`; the validator's settings are frozen at this point"""
+        validator = copy.copy(validator)
+        validator.state = dict(validator.state)
+        self._evict()
+        handle = BackgroundJob(job=job, total=job.meta["total"])
+        self.jobs[job.job_id] = handle
+        self._executor.submit(self._run, validator, handle)
+        return handle
+    
+    def _run(self, validator: "SitemapValidator", handle: BackgroundJob):
+        if handle.cancel_event.is_set():
+            handle.status = "cancelled"
+            handle.stopped_at = time.time()
+            return
+        handle.status = "running"
+        try:
+            _, handle.reused = validator.run_job(handle.job, on_result=handle.record, cancel_event=handle.cancel_event)
+            handle.host_stats = validator.state["host_stats"]
+            handle.status = "cancelled" if handle.cancel_event.is_set() else "complete"
+        except Exception as e:
+            handle.error = str(e)
+            handle.status = "failed"
+        handle.stopped_at = time.time()
+    
+    def _evict(self):
+        """Drop stopped jobs whose session never collected them, e.g. after the browser was closed"""
+        cutoff = time.time() - self.HANDLE_TTL
+        for job_id, handle in list(self.jobs.items()):
+            if handle.stopped_at is not None and handle.stopped_at < cutoff:
+                self.jobs.pop(job_id, None)
+    
+    def get(self, job_id: Optional[str]) -> Optional[BackgroundJob]:
+        self._evict()
+        return self.jobs.get(job_id)
+    
+    def cancel(self, job_id: str):
+        handle = self.jobs.get(job_id)
+        if handle:
+            handle.cancel_event.set()
+    
+    def forget(self, job_id: str):
+        """Drop a job that has stopped and whose results were collected"""
+        handle = self.jobs.get(job_id)
+        if handle and not handle.active:
+            del self.jobs[job_id]
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """The JobRunner shared by all sessions of this server"""
+    return JobRunner()
+
+class SitemapIndexExpander:
+    """
+    Concurrently expand a sitemap index into the URLs of its child sitemaps.
+    
+    Child sitemaps are fetched in parallel (bounded by `concurrency`), every
+    sitemap URL is loaded at most once so index cycles terminate, nested
+    indexes are only followed up to `max_depth` levels, and a failing child is
+    recorded in `SitemapInfo.children` instead of aborting the whole load.
+    
+    With a `sink`, <url> entries are handed over as soon as they are parsed
+    instead of being collected; once the sink returns False no further child
+    sitemaps are loaded.
+    """
+    
+    def __init__(self, validator: "SitemapValidator", max_depth: int = 1, concurrency: int = 10, sink=None):
+        self.validator = validator
+        self.max_depth = max_depth
+        self.concurrency = max(1, concurrency)
+        self.sink = sink
+        self.stopped = False
+        self.visited = set()
+        self.children = []
+        self._semaphore = None
+    
+    @staticmethod
+    def _normalize(url: str) -> str:
+        return urllib.parse.urldefrag(url.strip())[0]
+    
+    def _session(self) -> aiohttp.ClientSession:
+        timeout = aiohttp.ClientTimeout(total=self.validator.state["timeout"])
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        # Bodies are inflated by GzipStreamDecoder, which also handles .xml.gz files
+        return aiohttp.ClientSession(connector=connector, timeout=timeout, auto_decompress=False)
+    
+    async def expand(self, url: str) -> Tuple[URLTable, SitemapInfo, Dict]:
+        """Load the sitemap at `url`, following index entries up to the depth limit"""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.visited = {self._normalize(url)}
+        self.children = []
+        
+        async with self._session() as session:
+            urls, sitemap_info, info = await self._load(url, session)
+            
+            if sitemap_info.type == "index" and self.max_depth > 0:
+                urls, sitemap_info.urls_count = await self._expand_entries(urls, session, depth=1)
+                sitemap_info.children = self.children
+        
+        return urls, sitemap_info, info
+    
+    async def _load(self, url: str, session: aiohttp.ClientSession) -> Tuple[URLTable, SitemapInfo, Dict]:
+        """Load one sitemap and tag its <url> entries with the sitemap they came from"""
+        async def tag_and_forward(url_data: URLData) -> bool:
+            url_data.source_sitemap = url
+            return await self._forward(url_data)
+        
+        sink = tag_and_forward if self.sink is not None else None
+        urls, sitemap_info, info = await self.validator.stream_sitemap_async(url, session, sink)
+        if sitemap_info.type == "sitemap" and len(urls):
+            urls.frame["source_sitemap"] = url
+        return urls, sitemap_info, info
+    
+    async def _forward(self, url_data: URLData) -> bool:
+        if self.stopped:
+            return False
+        if await self.sink(url_data) is False:
+            self.stopped = True
+        return not self.stopped
+    
+    async def _expand_entries(self, entries: URLTable, session: aiohttp.ClientSession, depth: int) -> Tuple[URLTable, int]:
+        """Load child sitemaps; returns the collected URLs and the number of URLs found"""
+        results = await asyncio.gather(*(self._load_child(child_url, session, depth) for child_url in entries.values("url")))
+        return URLTable.concat([urls for urls, _ in results]), sum(count for _, count in results)
+    
+    async def _load_child(self, child_url: str, session: aiohttp.ClientSession, depth: int) -> Tuple[URLTable, int]:
+        report = {
+            "url": child_url,
+            "depth": depth,
+            "type": "unknown",
+            "status": "error",
+            "urls_count": 0,
+            "message": ""
+        }
+        self.children.append(report)
+        
+        key = self._normalize(child_url)
+        if key in self.visited:
+            report["status"] = "skipped"
+            report["message"] = "Already loaded (duplicate entry or index cycle)"
+            return URLTable(), 0
+        self.visited.add(key)
+        
+        # Hold a slot only while downloading, never while waiting on nested children
+        async with self._semaphore:
+            if self.stopped:
+                report["status"] = "skipped"
+                report["message"] = "Not loaded (URL limit reached)"
+                return URLTable(), 0
+            urls, sitemap_info, info = await self._load(child_url, session)
+        
+        report["type"] = sitemap_info.type
+        report["status"] = info["status"]
+        report["message"] = info["message"]
+        
+        if sitemap_info.type == "index":
+            if depth >= self.max_depth:
+                report["status"] = "skipped"
+                report["message"] = f"Nested index not expanded (crawl depth {self.max_depth})"
+                return URLTable(), 0
+            urls, report["urls_count"] = await self._expand_entries(urls, session, depth + 1)
+        else:
+            report["urls_count"] = sitemap_info.urls_count
+        
+        return urls, report["urls_count"]
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `burst`"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()  # FIFO, so waiting requests are served in order
+    
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostRateLimiter:
+    """
+    Per-host request rate limiting.
+    
+    Every host gets its own TokenBucket, so requests to one origin never wait
+    on another origin's budget and multi-host sitemaps are tested at the
+    combined speed of all hosts.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+    
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc.lower()
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+    
+    async def acquire(self, url: str):
+        """Wait until a request to the host of `url` is allowed"""
+        await self.bucket(url).acquire()
+
+class AIMDController:
+    """
+    Adaptive per-host concurrency (additive increase, multiplicative decrease).
+    
+    Every successful response raises a host's limit by 1/limit, i.e. about
+    one extra slot per round of requests, for as long as latency stays flat.
+    429/503 responses and timeouts halve it, and a window p95 that climbs past
+    `latency_factor` times the best p95 seen for the host cuts it by 30%.
+    Decreases are rate limited by `cooldown` so one burst of errors counts once.
+    """
+    
+    def __init__(self, initial: int = 4, maximum: int = 20, window: int = 50, latency_factor: float = 2.0, cooldown: float = 1.0):
+        self.initial = max(1, initial)
+        self.maximum = max(self.initial, maximum)
+        self.window = window
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.limits = {}
+        self.latencies = {}
+        self.baseline = {}
+        self.last_decrease = {}
+    
+    def limit(self, host: str) -> int:
+        return int(self.limits.get(host, self.initial))
+    
+    def record(self, host: str, latency_ms: Optional[float], congested: bool):
+        """Feed one completed request into the host's limit"""
+        if congested:
+            self._decrease(host, 0.5)
+            return
+        
+        limit = self.limits.get(host, float(self.initial))
+        window = self.latencies.setdefault(host, deque(maxlen=self.window))
+        if latency_ms:
+            window.append(latency_ms)
+        if len(window) >= min(self.window, 10):
+            p95 = float(np.percentile(window, 95))
+            baseline = self.baseline.get(host)
+            if baseline is None or p95 < baseline:
+                self.baseline[host] = p95
+            elif p95 > baseline * self.latency_factor:
+                self._decrease(host, 0.7)
+                return
+        self.limits[host] = min(float(self.maximum), limit + 1 / limit)
+    
+    def _decrease(self, host: str, factor: float):
+        now = time.monotonic()
+        if now - self.last_decrease.get(host, 0) < self.cooldown:
+            return
+        self.last_decrease[host] = now
+        self.limits[host] = max(1.0, self.limits.get(host, float(self.initial)) * factor)
+        # Judge the new limit on fresh latencies
+        self.latencies.pop(host, None)
+
+class HostScheduler:
+    """
+    Bounded URL queue that hands out work round-robin across hosts.
+    
+    Each host has its own FIFO; `get()` serves hosts in rotation and skips
+    any host that is at its concurrency limit (fixed `limit_per_host`, or the
+    AIMDController's current limit) or paused by a Retry-After header, so one
+    slow origin can never occupy every worker while URLs for other hosts wait.
+    Retries are parked with `retry()` and re-queued once their backoff
+    expires; the scheduler only counts as drained when none are pending.
+    """
+    
+    MAX_RETRY_AFTER = 300  # seconds; longer Retry-After values are capped
+    
+    def __init__(self, limit_per_host: int = 4, max_size: int = 1000, controller: Optional[AIMDController] = None):
+        self.limit_per_host = max(1, limit_per_host)
+        self.max_size = max(1, max_size)
+        self.controller = controller
+        self.queues = {}  # host -> deque of URLData
+        self.rotation = deque()  # hosts with queued URLs
+        self.in_flight = Counter()
+        self.completed = Counter()
+        self.paused_until = {}
+        self.size = 0
+        self.pending_retries = 0
+        self.closed = False
+        self._retry_tasks = set()
+        self._changed = asyncio.Condition()
+    
+    @staticmethod
+    def host(url: str) -> str:
+        return urlparse(url).netloc.lower()
+    
+    def limit(self, host: str) -> int:
+        return self.controller.limit(host) if self.controller else self.limit_per_host
+    
+    async def put(self, url_data: URLData):
+        """Queue a URL, waiting while the scheduler is full"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.size < self.max_size)
+            self._enqueue(url_data)
+    
+    def _enqueue(self, url_data: URLData):
+        host = self.host(url_data.url)
+        if host not in self.queues:
+            self.queues[host] = deque()
+            self.rotation.append(host)
+        self.queues[host].append(url_data)
+        self.size += 1
+        self._changed.notify_all()
+    
+    def retry(self, url_data: URLData, delay: float):
+        """Re-queue a URL after `delay` seconds without holding a worker"""
+        self.pending_retries += 1
+        task = asyncio.create_task(self._requeue(url_data, delay))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+    
+    async def _requeue(self, url_data: URLData, delay: float):
+        await asyncio.sleep(delay)
+        async with self._changed:
+            # Retries skip the size bound: they are capped by the retry budget,
+            # and waiting here while the producer fills the queue could stall
+            self.pending_retries -= 1
+            self._enqueue(url_data)
+    
+    def _next_host(self) -> Optional[str]:
+        now = time.monotonic()
+        for _ in range(len(self.rotation)):
+            host = self.rotation[0]
+            self.rotation.rotate(-1)  # the host checked goes to the back of the rotation
+            if self.in_flight[host] < self.limit(host) and self.paused_until.get(host, 0) <= now:
+                return host
+        return None
+    
+    async def get(self) -> Optional[Tuple[str, URLData]]:
+        """Next (host, URL) in round-robin order; None once closed and drained"""
+        async with self._changed:
+            while True:
+                host = self._next_host()
+                if host is not None:
+                    break
+                if self.closed and not self.size and not self.pending_retries:
+                    return None
+                # Wake up when something changes or the earliest Retry-After pause ends
+                resume = [until for until in self.paused_until.values() if until > time.monotonic()]
+                try:
+                    await asyncio.wait_for(self._changed.wait(), min(resume) - time.monotonic() if resume else None)
+                except asyncio.TimeoutError:
+                    pass
+            
+            queue = self.queues[host]
+            url_data = queue.popleft()
+            self.size -= 1
+            self.in_flight[host] += 1
+            if not queue:
+                del self.queues[host]
+                self.rotation.remove(host)
+            self._changed.notify_all()
+            return host, url_data
+    
+    async def task_done(self, host: str, latency_ms: Optional[float] = None, congested: bool = False, retry_after: Optional[float] = None):
+        """Release the slot taken by get() and report how the request went"""
+        async with self._changed:
+            self.in_flight[host] -= 1
+            self.completed[host] += 1
+            if not self.in_flight[host]:
+                del self.in_flight[host]
+            if self.controller:
+                self.controller.record(host, latency_ms, congested)
+            if retry_after:
+                self.paused_until[host] = time.monotonic() + min(retry_after, self.MAX_RETRY_AFTER)
+            self._changed.notify_all()
+    
+    async def close(self):
+        """No more URLs will be queued"""
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+    
+    def cancel_retries(self):
+        for task in self._retry_tasks:
+            task.cancel()
+    
+    def host_stats(self) -> Dict[str, Dict[str, int]]:
+        """Queued, in-flight and completed request counts and the concurrency limit per host"""
+        hosts = set(self.queues) | set(self.in_flight) | set(self.completed)
+        return {
+            host: {
+                "queued": len(self.queues.get(host, ())),
+                "in_flight": self.in_flight.get(host, 0),
+                "completed": self.completed.get(host, 0),
+                "concurrency": self.limit(host)
+            }
+            for host in sorted(hosts)
+        }
+
+# Statuses worth retrying, by error class
+RETRYABLE_STATUSES = {
+    408: "timeout",
+    429: "rate_limited",
+    500: "server_error",
+    502: "server_error",
+    503: "server_error",
+    504: "server_error",
+}
+
+class RetryPolicy:
+    """
+    Decides whether a failed attempt is retried, and after how long.
+    
+    Each error class has its own retry count and base delay; the wait is
+    exponential backoff with full jitter (uniform in [0, base * 2^retry]),
+    never shorter than a Retry-After header. A global budget caps retries at
+    `budget_ratio` of the URLs submitted (with a small floor), so a failing
+    host can't multiply the number of requests, and the run time, by the
+    number of attempts.
+    """
+    
+    POLICIES = {
+        "timeout": {"retries": 2, "base_delay": 1.0},
+        "connection": {"retries": 3, "base_delay": 0.5},
+        "server_error": {"retries": 2, "base_delay": 2.0},
+        "rate_limited": {"retries": 3, "base_delay": 5.0},
+    }
+    
+    def __init__(self, budget_ratio: float = 0.2, min_budget: int = 10, max_delay: float = 60.0, policies: Optional[Dict[str, Dict]] = None, seed: Optional[int] = None):
+        self.budget_ratio = max(0.0, budget_ratio)
+        self.min_budget = min_budget
+        self.max_delay = max_delay
+        self.policies = policies or self.POLICIES
+        self.retries_used = 0
+        self._rng = random.Random(seed)
+    
+    def budget(self, submitted: int) -> int:
+        return max(self.min_budget, int(submitted * self.budget_ratio))
+    
+    def next_delay(self, url_data: URLData, submitted: int) -> Optional[float]:
+        """Seconds to wait before retrying `url_data`, or None to keep the result"""
+        if not url_data.attempts:
+            return None
+        attempt = url_data.attempts[-1]
+        policy = self.policies.get(attempt["error_class"])
+        retries = len(url_data.attempts) - 1
+        if not policy or retries >= policy["retries"] or self.retries_used >= self.budget(submitted):
+            return None
+        
+        self.retries_used += 1
+        delay = self._rng.uniform(0, min(self.max_delay, policy["base_delay"] * 2 ** retries))
+        if url_data.retry_after:
+            delay = max(delay, min(url_data.retry_after, HostScheduler.MAX_RETRY_AFTER))
+        attempt["retry_in"] = round(delay, 2)
+        return delay
+
+class ValidationEngine:
+    """
+    Bounded worker pool for URL testing.
+    
+    A fixed number of worker coroutines pull URLs from a bounded
+    HostScheduler (round-robin across hosts, capped per host) and push results
+    to a bounded outbox, so only a few thousand URLs are ever in flight
+    however many are submitted. With a RetryPolicy, transient failures are
+    handed back to the scheduler to run again after their backoff, and only
+    the final attempt reaches the outbox. Use it as an async context manager,
+    then either `run()` an iterable of URLs or `submit()` / `close()` from a
+    producer task while consuming `results()`.
+    """
+    
+    def __init__(self, validator: "SitemapValidator", workers: int = 10, queue_size: int = 1000, limit_per_host: int = 4, adaptive: bool = False, retry_policy: Optional[RetryPolicy] = None):
+        self.validator = validator
+        self.workers_count = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.limit_per_host = max(1, limit_per_host)
+        self.adaptive = adaptive
+        self.retry_policy = retry_policy
+        self.submitted = 0
+        self.completed = 0
+        self._workers = []
+    
+    async def __aenter__(self) -> "ValidationEngine":
+        controller = AIMDController(initial=self.limit_per_host, maximum=self.workers_count) if self.adaptive else None
+        connector = aiohttp.TCPConnector(
+            limit=self.workers_count,
+            limit_per_host=controller.maximum if controller else self.limit_per_host,
+            keepalive_timeout=self.validator.state["keepalive_timeout"],
+            use_dns_cache=True,
+            ttl_dns_cache=self.validator.state["dns_cache_ttl"]
+        )
+        timeout = aiohttp.ClientTimeout(total=self.validator.state["timeout"])
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        self._limiter = self.validator.rate_limiter()
+        self._resolver = RedirectResolver(self.validator, self.validator.state["max_redirects"])
+        self.scheduler = HostScheduler(self.limit_per_host, self.queue_size, controller)
+        self._outbox = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers_count)]
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self.scheduler.cancel_retries()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self._session.close()
+    
+    async def _work(self):
+        while True:
+            item = await self.scheduler.get()
+            if item is None:
+                await self._outbox.put(None)
+                return
+            host, url_data = item
+            url_data.concurrency = self.scheduler.limit(host)
+            outcome = {}
+            try:
+                url_data = await self.validator.test_url_async(url_data, self._session, self._limiter, self._resolver)
+                outcome = {
+                    "latency_ms": url_data.response_time,
+                    "congested": url_data.status_code in (408, 429, 503),
+                    "retry_after": url_data.retry_after
+                }
+            finally:
+                await self.scheduler.task_done(host, **outcome)
+            
+            delay = self.retry_policy.next_delay(url_data, self.submitted) if self.retry_policy else None
+            if delay is not None:
+                # Start the next attempt from a clean slate; the last one stays in `attempts`
+                url_data.error = None
+                url_data.retry_after = None
+                self.scheduler.retry(url_data, delay)
+                continue
+            await self._outbox.put(url_data)
+    
+    async def submit(self, url_data: URLData):
+        """Queue a URL for testing, waiting while the scheduler is full"""
+        url_data.attempts = []
+        await self.scheduler.put(url_data)
+        self.submitted += 1
+    
+    async def close(self):
+        """Signal that no more URLs will be submitted"""
+        await self.scheduler.close()
+    
+    def busiest_hosts(self, count: int = 3) -> str:
+        """Short summary of the hosts with the most requests in flight"""
+        busiest = self.scheduler.in_flight.most_common(count)
+        return ", ".join(f"{host}: {in_flight}" for host, in_flight in busiest)
+    
+    async def results(self) -> AsyncIterator[URLData]:
+        """Yield tested URLs as they complete, until every worker has finished"""
+        finished = 0
+        while finished < len(self._workers):
+            url_data = await self._outbox.get()
+            if url_data is None:
+                finished += 1
+                continue
+            self.completed += 1
+            yield url_data
+    
+    async def run(self, urls: Iterable[URLData]) -> AsyncIterator[URLData]:
+        """Test `urls` and yield the results in completion order"""
+        async def feed():
+            try:
+                for url_data in urls:
+                    await self.submit(url_data)
+            finally:
+                await self.close()
+        
+        feeder = asyncio.create_task(feed())
+        try:
+            async for url_data in self.results():
+                yield url_data
+        finally:
+            feeder.cancel()
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class RedirectResolver:
+    """
+    Follows redirect chains and memoizes where each URL ends up.
+    
+    Resolutions are shared through `memo` (URL -> future of the resolution),
+    so when thousands of sitemap URLs redirect to the same target (http to
+    https, trailing slash) the target chain is fetched once and every other
+    URL awaits or reuses that result. Chains stop at `max_hops` and on loops.
+    """
+    
+    def __init__(self, validator: "SitemapValidator", max_hops: int = 10):
+        self.validator = validator
+        self.max_hops = max(1, max_hops)
+        self.memo = {}
+    
+    async def resolve(self, url: str, session: aiohttp.ClientSession, limiter: Optional[HostRateLimiter] = None) -> Dict:
+        """
+        Resolve the redirect chain starting at `url`
+        
+        Returns a dict with the final URL and status code, every hop
+        (url, status_code, location, time_ms) and an error message for loops,
+        hop-limit overruns and failed requests.
+        """
+        future = self.memo.get(url)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.memo[url] = future
+            try:
+                future.set_result(await self._follow(url, session, limiter))
+            except BaseException:
+                # Let the next caller try again instead of waiting forever
+                del self.memo[url]
+                future.cancel()
+                raise
+        return await asyncio.shield(future)
+    
+    async def _follow(self, url: str, session: aiohttp.ClientSession, limiter: Optional[HostRateLimiter]) -> Dict:
+        headers = {"User-Agent": self.validator.state["user_agent"]}
+        chain = []
+        seen = set()
+        current = url
+        while True:
+            if current in seen:
+                return {"final_url": current, "final_status_code": None, "chain": chain, "error": "Redirect loop"}
+            if len(chain) >= self.max_hops:
+                return {"final_url": current, "final_status_code": None, "chain": chain, "error": f"More than {self.max_hops} redirects"}
+            seen.add(current)
+            
+            # Reuse a chain another URL has already resolved from here (never wait on one, which could deadlock)
+            known = self.memo.get(current)
+            if current != url and known is not None and known.done():
+                resolved = known.result()
+                return dict(resolved, chain=chain + resolved["chain"])
+            
+            try:
+                if limiter:
+                    await limiter.acquire(current)
+                start_time = time.time()
+                async with self.validator._probe(session, current, headers) as response:
+                    hop = {
+                        "url": current,
+                        "status_code": response.status,
+                        "location": None,
+                        "time_ms": round((time.time() - start_time) * 1000, 2)
+                    }
+                    location = response.headers.get("Location")
+            except asyncio.TimeoutError:
+                chain.append({"url": current, "status_code": 408, "location": None, "time_ms": self.validator.state["timeout"] * 1000})
+                return {"final_url": current, "final_status_code": 408, "chain": chain, "error": "Request timed out"}
+            except Exception as e:
+                return {"final_url": current, "final_status_code": None, "chain": chain, "error": str(e)}
+            
+            chain.append(hop)
+            if hop["status_code"] not in REDIRECT_STATUSES or not location:
+                return {"final_url": current, "final_status_code": hop["status_code"], "chain": chain, "error": None}
+            hop["location"] = current = urllib.parse.urljoin(current, location)
+
+class RobotsRules:
+    """
+    Compiled robots.txt Allow/Disallow rules for one user agent.
+    
+    Plain path rules are merged into a prefix trie which is compiled into a
+    single regex (a terminal node becomes an optional group), so the longest
+    matching rule is found in one C-level scan of the path. Rules with `*` or
+    a trailing `$` are compiled to their own regexes and only consulted when
+    they are longer than the best plain match. As in RFC 9309 the most
+    specific (longest) rule wins and Allow wins ties.
+    """
+    
+    _END = ""  # trie key marking the end of a rule
+    
+    def __init__(self, rules: Iterable[Tuple[bool, str]] = (), sitemaps: Optional[List[str]] = None, disallow_all: bool = False):
+        self.sitemaps = sitemaps or []
+        self.disallow_all = disallow_all
+        self.rules_count = 0
+        self._trie = {}
+        self._literals = {}  # pattern -> allowed
+        self._wildcards = []
+        for allow, pattern in rules:
+            self._add(allow, pattern)
+        
+        self._literal = re.compile(self._trie_regex(self._trie)) if self._literals else None
+        # Longest first, Allow before Disallow at equal length
+        self._wildcards.sort(key=lambda rule: (rule[0], rule[1]), reverse=True)
+        # One combined pass rules out most paths before trying the wildcards one by one
+        self._any_wildcard = re.compile("|".join(f"(?:{regex.pattern})" for _, _, regex in self._wildcards)) if self._wildcards else None
+    
+    @staticmethod
+    def _normalize(pattern: str) -> str:
+        # Sitemap URLs are percent-encoded, so encode rules the same way
+        return urllib.parse.quote(urllib.parse.unquote(pattern), safe="/?=&;:@!$'()*+,-._~")
+    
+    def _add(self, allow: bool, pattern: str):
+        pattern = self._normalize(pattern)
+        if not pattern:
+            return  # an empty Disallow allows everything
+        self.rules_count += 1
+        if "*" in pattern or pattern.endswith("$"):
+            regex = re.escape(pattern.rstrip("$")).replace(r"\*", ".*")
+            regex += "$" if pattern.endswith("$") else ""
+            self._wildcards.append((len(pattern), allow, re.compile(regex)))
+            return
+        node = self._trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[self._END] = True
+        self._literals[pattern] = self._literals.get(pattern, False) or allow
+    
+    @classmethod
+    def _trie_regex(cls, node: Dict) -> str:
+        """Regex whose greedy match of a path ends at the longest rule that prefixes it"""
+        branches = []
+        for char, child in sorted(node.items()):
+            if char == cls._END:
+                continue
+            # Collapse chains of single-child nodes into one literal run
+            run = char
+            while len(child) == 1 and cls._END not in child:
+                (char, child), = child.items()
+                run += char
+            branches.append(re.escape(run) + cls._trie_regex(child))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if cls._END in node else body
+    
+    @classmethod
+    def parse(cls, content: str, user_agent: str) -> "RobotsRules":
+        """Compile the group that applies to `user_agent` (falling back to `*`)"""
+        agent = user_agent.lower()
+        groups = []  # (user agent names, rules)
+        sitemaps = []
+        current = None
+        for line in content.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            key, value = (part.strip() for part in line.split(":", 1))
+            key = key.lower()
+            if key == "user-agent":
+                # Consecutive User-agent lines share one group
+                if current is None or current[1]:
+                    current = ([], [])
+                    groups.append(current)
+                current[0].append(value.lower())
+            elif key in ("allow", "disallow") and current is not None:
+                current[1].append((key == "allow", value))
+            elif key == "sitemap":
+                sitemaps.append(value)
+        
+        # The group naming the longest part of our user agent wins; `*` is the fallback
+        best, rules = 0, []
+        for names, group_rules in groups:
+            for name in names:
+                if name == "*":
+                    score = 0.5
+                else:
+                    score = len(name) + 1 if name and name in agent else 0
+                if score > best:
+                    best, rules = score, list(group_rules)
+                elif score and score == best:
+                    rules.extend(group_rules)
+        return cls(rules, sitemaps)
+    
+    def is_allowed(self, path: str) -> bool:
+        """Whether a URL path (with query string) may be crawled"""
+        if self.disallow_all:
+            return False
+        best_length, allowed = 0, True
+        match = self._literal.match(path) if self._literal else None
+        if match:
+            best_length, allowed = match.end(), self._literals[match.group()]
+        if self._any_wildcard is None or not self._any_wildcard.match(path):
+            return allowed
+        for length, allow, regex in self._wildcards:
+            if length < best_length or (length == best_length and not allow):
+                break
+            if regex.match(path):
+                return allow
+        return allowed
+    
+    def blocked(self, paths: Iterable[str]) -> np.ndarray:
+        """Boolean mask of the paths that robots.txt disallows"""
+        paths = list(paths)
+        if self.disallow_all:
+            return np.ones(len(paths), dtype=bool)
+        if not self.rules_count:
+            return np.zeros(len(paths), dtype=bool)
+        is_allowed = self.is_allowed
+        return np.fromiter((not is_allowed(path) for path in paths), dtype=bool, count=len(paths))
+
+class StratifiedSampler:
+    """
+    Reproducible stratified sample of a URL table.
+    
+    URLs are grouped into strata by any combination of their source sitemap,
+    host and leading path segments, the sample size is split across strata in
+    proportion to their size (every stratum gets at least one URL while the
+    budget allows), and URLs are drawn within each stratum either uniformly or
+    with probability proportional to a per-URL weight. Each sampled row keeps
+    its stratum and design weight so metrics can be extrapolated afterwards.
+    """
+    
+    STRATA = ("sitemap", "host", "path")
+    
+    def __init__(self, strata: Iterable[str] = ("sitemap",), seed: Optional[int] = None, path_depth: int = 1):
+        self.strata = [name for name in self.STRATA if name in set(strata)]
+        self.seed = seed
+        self.path_depth = max(1, path_depth)
+    
+    def stratum_keys(self, urls: URLTable) -> pd.Series:
+        """Stratum label of every row"""
+        frame = urls.frame
+        parts = []
+        if "sitemap" in self.strata:
+            parts.append(frame["source_sitemap"].fillna("(sitemap)").astype(str))
+        if "host" in self.strata or "path" in self.strata:
+            # Host and the first `path_depth` path segments in one regex pass
+            pattern = r"^[A-Za-z][\w+.-]*://([^/?#]*)((?:/[^/?#]*){0,%d})" % self.path_depth
+            location = frame["url"].astype(str).str.extract(pattern)
+            if "host" in self.strata:
+                parts.append(location[0].fillna("").str.lower())
+            if "path" in self.strata:
+                parts.append(location[1].fillna("").str.rstrip("/").replace("", "/"))
+        if not parts:
+            return pd.Series("all", index=frame.index)
+        keys = parts[0]
+        for part in parts[1:]:
+            keys = keys + " | " + part
+        return keys
+    
+    @staticmethod
+    def _allocate(sizes: np.ndarray, n: int) -> np.ndarray:
+        """Proportional allocation with a minimum of one URL per stratum (largest strata first)"""
+        allocation = np.zeros(len(sizes), dtype=np.int64)
+        allocation[np.argsort(-sizes, kind="stable")[:n]] = 1
+        remaining = n - int(allocation.sum())
+        if remaining > 0:
+            capacity = sizes - allocation
+            share = remaining * capacity / capacity.sum()
+            extra = np.floor(share).astype(np.int64)
+            # Largest remainders get the leftover URLs; extra + 1 never exceeds capacity there
+            order = np.argsort(-(share - extra), kind="stable")
+            extra[order[:remaining - int(extra.sum())]] += 1
+            allocation += extra
+        return allocation
+    
+    def sample(self, urls: URLTable, n: int, weights: Optional[np.ndarray] = None) -> Tuple[URLTable, Dict]:
+        """
+        Draw `n` URLs and return them with the sampling design
+        
+        Args:
+            urls: The full URL table
+            n: Sample size
+            weights: Optional positive per-row weights; URLs are then drawn with
+                probability proportional to weight inside their stratum
+        """
+        keys = self.stratum_keys(urls)
+        codes, labels = pd.factorize(keys)
+        population = len(codes)
+        sizes = np.bincount(codes, minlength=len(labels)).astype(np.int64)
+        allocation = sizes.copy() if n >= population else self._allocate(sizes, n)
+        
+        rng = np.random.default_rng(self.seed)
+        # Efraimidis-Spirakis keys: the top-k of log(u) / w is a weighted sample without replacement
+        sort_keys = np.log(rng.random(population))
+        if weights is not None:
+            sort_keys = sort_keys / weights
+        order = np.lexsort((-sort_keys, codes))
+        sorted_codes = codes[order]
+        starts = np.searchsorted(sorted_codes, np.arange(len(labels)))
+        rank = np.arange(population) - starts[sorted_codes]
+        chosen = np.sort(order[rank < allocation[sorted_codes]])
+        
+        chosen_codes = codes[chosen]
+        if weights is None:
+            inclusion = allocation[chosen_codes] / sizes[chosen_codes]
+        else:
+            # Standard approximation of PPS-without-replacement inclusion probabilities
+            stratum_weights = np.bincount(codes, weights=weights, minlength=len(labels))
+            inclusion = np.minimum(1.0, allocation[chosen_codes] * weights[chosen] / stratum_weights[chosen_codes])
+        
+        frame = urls.frame.iloc[chosen].copy()
+        frame["stratum"] = labels[chosen_codes].to_numpy()
+        frame["sample_weight"] = 1.0 / inclusion
+        design = {
+            "population": population,
+            "sample_size": len(chosen),
+            "strata_by": self.strata,
+            "weighted": weights is not None,
+            "seed": self.seed,
+            "strata": {
+                str(label): {"size": int(size), "sampled": int(sampled)}
+                for label, size, sampled in zip(labels, sizes, allocation)
+            }
+        }
+        return URLTable(frame.reset_index(drop=True)), design
+
 class SitemapValidator:
     """Advanced Sitemap Validator with enhanced features and analytics"""
     
@@ -432,8 +2507,21 @@ class SitemapValidator:
                 "advanced_mode": False,
                 "content_analysis": False,
                 "check_structured_data": False,
-                "rate_limit": 100,  # ms between requests
+                "rate_limit_rps": 10.0,  # requests per second per host, 0 = unlimited
+                "rate_limit_burst": 5,
+                "limit_per_host": 4,  # concurrent requests per host (starting point when adaptive)
+                "adaptive_concurrency": True,  # AIMD per-host limits driven by latency and 429/503
+                "keepalive_timeout": 30,  # seconds an idle connection is kept open
+                "dns_cache_ttl": 300,  # seconds
+                "host_stats": {},  # per-host request counts from the last test run
                 "follow_redirects": True,
+                "max_redirects": 10,  # hops before a chain is reported as too long
+                "retry_enabled": True,  # retry timeouts, connection errors and 429/5xx
+                "retry_budget": 0.2,  # retries allowed per submitted URL across the run
+                "incremental_mode": False,  # only retest new, changed or stale URLs
+                "run_in_background": True,  # test on the JobRunner instead of the script thread
+                "freshness_hours": 24,  # stored results younger than this are reused
+                "job_retention_hours": 24,  # completed jobs whose results were never collected are deleted after this
                 "crawl_depth": 1,
                 "max_urls_to_check": 1000,
                 "check_mobile_friendly": False,
@@ -450,8 +2538,30 @@ class SitemapValidator:
                 "export_format": "csv",  # or "json", "excel"
                 "prioritize_critical_issues": True,
                 "ignore_query_strings": False,
+                "parser_engine": "streaming",  # or "beautifulsoup"
+                "pipeline_mode": False,  # test URLs while the sitemap is still loading
+                "pipeline_queue_size": 1000,
+                "sample_strategy": "stratified",  # or "first"
+                "sample_strata": ["sitemap"],  # any of "sitemap", "host", "path"
+                "sample_weighting": "none",  # or "priority", "lastmod"
+                "sample_seed": 42,
+                "sample_path_depth": 1,
+                "probe_mode": "get",  # "head", "head_fallback" or "range"
+                "range_bytes": 16384,  # bytes requested in "range" probe mode
+                "head_bytes": 131072,  # most of a page read for content analysis
+                "max_body_bytes": 10 * 1024 * 1024,  # cap on any response body read
+                "measure_body_size": True,  # read bodies sent without Content-Length to measure them
+                "detect_duplicates": False,  # fingerprint page text during content analysis; reads pages past the first H1
+                "robots_ttl": 3600,  # seconds before robots.txt is fetched again
+                "robots_cache": {},  # origin -> parsed robots.txt
+                "cache_dir": ".sitemap_cache",
+                "cache_max_bytes": 512 * 1024 * 1024,  # per store; least recently used entries go first
             }
         self.state = st.session_state.validator_state
+        self.http_cache = HTTPCache(Path(self.state["cache_dir"]) / "http", self.state["cache_max_bytes"])
+        self.parsed_store = ParsedSitemapStore(Path(self.state["cache_dir"]) / "parsed", self.state["cache_max_bytes"])
+        self.result_store = URLResultStore(Path(self.state["cache_dir"]) / "results.sqlite")
+        self.html_pool = get_html_pool()
         
     def icon(self, name: str, color: str = "currentColor") -> str:
         """Return an icon SVG with specified color"""
@@ -462,10 +2572,18 @@ class SitemapValidator:
     def load_css_and_javascript(self):
         """Load custom CSS and JavaScript for enhanced UI interactions"""
         st.markdown(CUSTOM_STYLES, unsafe_allow_html=True)
+    
+    def show_index_report(self, sitemap_info: SitemapInfo):
+        """Summarize child sitemaps that failed or were skipped while expanding an index"""
+        problems = [child for child in sitemap_info.children if child["status"] != "success"]
+        if not problems:
+            return
+        st.warning(f"{len(problems)} of {len(sitemap_info.children)} child sitemaps could not be loaded or were skipped")
+        with st.expander("Child sitemap report"):
+            st.dataframe(pd.DataFrame(sitemap_info.children))
         
-    @st.cache_data(ttl=3600)
-    def load_sitemap(_self, url: str) -> Tuple[str, Dict]:
-        """Load and parse sitemap XML with Streamlit caching"""
+    def load_sitemap(self, url: str) -> Tuple[str, Dict]:
+        """Load sitemap XML as text, revalidating against the on-disk HTTP cache"""
         info = {
             "status": "error",
             "message": "",
@@ -475,104 +2593,307 @@ class SitemapValidator:
         }
         
         try:
-            headers = {"User-Agent": _self.state["user_agent"]}
-            response = requests.get(url, headers=headers, timeout=_self.state["timeout"])
+            headers = {"User-Agent": self.state["user_agent"]}
+            response = self.http_cache.get(url, headers, timeout=self.state["timeout"])
             
             info["status"] = "success" if response.status_code == 200 else "error"
             info["message"] = f"HTTP Status: {response.status_code}"
+            if response.from_cache:
+                info["message"] = "HTTP Status: 304 (served from cache)"
             info["content_type"] = response.headers.get("Content-Type", "")
             info["size"] = len(response.content)
             info["is_gzipped"] = response.headers.get("Content-Encoding", "") == "gzip"
             
             if response.status_code != 200:
                 return "", info
+            
+            # Served .xml.gz files arrive as gzip bodies rather than transfer-encoded text
+            if response.content.startswith(GZIP_MAGIC):
+                decoder = GzipStreamDecoder()
+                content = decoder.decompress(response.content) + decoder.flush()
+                info["is_gzipped"] = True
+                info["size"] = len(content)
+                return content.decode("utf-8", errors="replace"), info
                 
             return response.text, info
         except Exception as e:
             info["message"] = f"Error loading sitemap: {str(e)}"
             return "", info
 
-    @st.cache_data(ttl=3600)
-    def extract_urls_from_sitemap(_self, xml_content: str, recursive: bool = True) -> Tuple[List[URLData], SitemapInfo]:
+    async def stream_sitemap_async(self, url: str, session: aiohttp.ClientSession, sink=None) -> Tuple[URLTable, SitemapInfo, Dict]:
+        """
+        Download a sitemap and parse it while it streams in.
+        
+        Gzip bodies are decompressed chunk by chunk straight into the parser, so
+        neither the compressed nor the decompressed document is ever held in
+        memory. Malformed XML falls back to the BeautifulSoup parser.
+        
+        Args:
+            url: The sitemap URL
+            session: The aiohttp session to download with
+            sink: Optional async callable that receives each <url> entry as soon as it
+                is parsed instead of collecting it (index entries are always returned).
+                Returning False from the sink refuses the entry and stops the download.
+        """
+        info = {
+            "status": "error",
+            "message": "",
+            "content_type": None,
+            "size": 0,
+            "compressed_size": 0,
+            "is_gzipped": False
+        }
+        sitemap_info = SitemapInfo(url=url, type="unknown", urls_count=0)
+        
+        if self.state["parser_engine"] != "streaming":
+            return await self._load_sitemap_soup_async(url, sink)
+        
+        cached = self.http_cache.lookup(url)
+        writer = None
+        sent = set()  # locs already handed to the sink, in case the lenient parser has to take over
+        try:
+            # Only ask for gzip so the decoder can handle every compressed layer itself
+            headers = {"User-Agent": self.state["user_agent"], "Accept-Encoding": "gzip"}
+            headers.update(self.http_cache.conditional_headers(cached))
+            async with session.get(url, headers=headers) as response:
+                from_cache = response.status == 304 and cached is not None
+                info["status"] = "success" if response.status == 200 or from_cache else "error"
+                info["message"] = f"HTTP Status: {response.status}"
+                info["content_type"] = response.headers.get("Content-Type", "")
+                info["from_cache"] = from_cache
+                
+                if info["status"] != "success":
+                    if response.status in (404, 410):
+                        self.http_cache.invalidate(url)
+                    return URLTable(), sitemap_info, info
+                
+                decoder = GzipStreamDecoder()
+                parser = SitemapStreamParser()
+                urls = []
+                stopped = False
+                forwarded = 0
+                
+                async def consume(data: bytes):
+                    nonlocal stopped, forwarded
+                    entries = parser.feed(data)
+                    if sink is None or parser.type != "sitemap":
+                        urls.extend(entries)
+                        return
+                    for entry in entries:
+                        if await sink(entry) is False:
+                            stopped = True
+                            return
+                        sent.add(entry.url)
+                        forwarded += 1
+                
+                if from_cache:
+                    cached = self.http_cache.revalidated(url, cached, response.headers)
+                    info["message"] = "HTTP Status: 304 (served from cache)"
+                    info["content_type"] = cached["headers"].get("Content-Type", "")
+                    
+                    # Unchanged document parsed before: skip the XML entirely
+                    stored = self.parsed_store.get(cached.get("sha256"))
+                    if stored:
+                        urls, meta = stored
+                        info.update(size=meta["size"], compressed_size=meta["compressed_size"], is_gzipped=meta["is_gzipped"])
+                        sitemap_info = self._sitemap_info(url, meta["type"], urls, info)
+                        return await self._forward_to_sink(urls, meta["type"], sink), sitemap_info, info
+                    
+                    # Not modified: replay the body stored on disk
+                    content_encoding = cached["headers"].get("Content-Encoding", "").lower()
+                    chunks = self.http_cache.iter_body(url, SITEMAP_CHUNK_SIZE)
+                    for chunk in chunks:
+                        info["compressed_size"] += len(chunk)
+                        data = decoder.decompress(chunk)
+                        info["size"] += len(data)
+                        await consume(data)
+                        if stopped:
+                            chunks.close()
+                            break
+                else:
+                    content_encoding = response.headers.get("Content-Encoding", "").lower()
+                    writer = self.http_cache.writer(url)
+                    async for chunk in response.content.iter_chunked(SITEMAP_CHUNK_SIZE):
+                        writer.write(chunk)
+                        info["compressed_size"] += len(chunk)
+                        data = decoder.decompress(chunk)
+                        info["size"] += len(data)
+                        await consume(data)
+                        if stopped:
+                            break
+                
+                info["is_gzipped"] = decoder.compressed or content_encoding == "gzip"
+                if stopped:
+                    # The consumer has had enough; leave the partial body out of the caches
+                    info["message"] += " (stopped early)"
+                    sitemap_info = self._sitemap_info(url, parser.type, URLTable(), info)
+                    sitemap_info.urls_count = forwarded
+                    return URLTable(), sitemap_info, info
+                
+                data = decoder.flush()
+                info["size"] += len(data)
+                await consume(data)
+                urls.extend(parser.close())
+                
+                urls = URLTable.from_urls(urls if parser.type != "unknown" else [])
+                
+                digest = cached.get("sha256") if from_cache else None
+                if writer:
+                    digest = writer.commit(response.headers)["sha256"]
+                    writer = None
+                    if cached and cached.get("sha256") != digest:
+                        # The sitemap changed; its old parse will never be looked up again
+                        self.parsed_store.discard(cached.get("sha256"))
+                if not forwarded:
+                    # Forwarded entries were never collected, so there is nothing to store
+                    self.parsed_store.put(digest, urls, {
+                        "type": parser.type,
+                        "size": info["size"],
+                        "compressed_size": info["compressed_size"],
+                        "is_gzipped": info["is_gzipped"]
+                    })
+        except ET.ParseError:
+            # Malformed XML: re-fetch the document and use the lenient parser,
+            # skipping the entries streamed before the error
+            return await self._load_sitemap_soup_async(url, sink, skip=sent)
+        except asyncio.TimeoutError:
+            info["status"] = "error"
+            info["message"] = "Error loading sitemap: request timed out"
+            return URLTable(), sitemap_info, info
+        except Exception as e:
+            info["status"] = "error"
+            info["message"] = f"Error loading sitemap: {str(e)}"
+            return URLTable(), sitemap_info, info
+        finally:
+            if writer:
+                writer.discard()
+        
+        sitemap_info = self._sitemap_info(url, parser.type, urls, info)
+        sitemap_info.urls_count += forwarded
+        return urls, sitemap_info, info
+    
+    async def _load_sitemap_soup_async(self, url: str, sink=None, skip: Optional[set] = None) -> Tuple[URLTable, SitemapInfo, Dict]:
+        """Run the BeautifulSoup loader off the event loop; entries whose loc is in `skip` aren't forwarded"""
+        urls, sitemap_info, info = await asyncio.get_running_loop().run_in_executor(None, self._load_sitemap_soup, url)
+        return await self._forward_to_sink(urls, sitemap_info.type, sink, skip), sitemap_info, info
+    
+    async def _forward_to_sink(self, urls: URLTable, sitemap_type: str, sink, skip: Optional[set] = None) -> URLTable:
+        """Hand already parsed <url> entries to a pipeline sink instead of returning them"""
+        if sink is None or sitemap_type != "sitemap":
+            return urls
+        for url_data in urls:
+            if skip and url_data.url in skip:
+                continue
+            if await sink(url_data) is False:
+                break
+        return URLTable()
+    
+    def _sitemap_info(self, url: str, sitemap_type: str, urls: URLTable, info: Dict) -> SitemapInfo:
+        return SitemapInfo(
+            url=url,
+            type=sitemap_type,
+            size=info["size"],
+            urls_count=len(urls),
+            compression="gzip" if info["is_gzipped"] else "none",
+            compressed_size=info["compressed_size"]
+        )
+    
+    def _load_sitemap_soup(self, url: str) -> Tuple[URLTable, SitemapInfo, Dict]:
+        """Download a sitemap in full and parse it with BeautifulSoup"""
+        sitemap_info = SitemapInfo(url=url, type="unknown", urls_count=0)
+        content, info = self.load_sitemap(url)
+        if info["status"] != "success" or not content:
+            return URLTable(), sitemap_info, info
+        
+        try:
+            urls, sitemap_info = self._extract_urls_soup(content)
+        except Exception as e:
+            info["status"] = "error"
+            info["message"] = f"Error parsing sitemap: {str(e)}"
+            return URLTable(), sitemap_info, info
+        
+        sitemap_info.url = url
+        sitemap_info.size = info["size"]
+        sitemap_info.compression = "gzip" if info["is_gzipped"] else "none"
+        return urls, sitemap_info, info
+    
+    def load_urls_from_sitemap(self, url: str, recursive: bool = True) -> Tuple[URLTable, SitemapInfo, Dict]:
         """
-        Extract URLs and metadata from sitemap XML with support for sitemap index
+        Stream a sitemap and, for sitemap indexes, the sitemaps it links to
         
         Args:
-            xml_content: The XML content of the sitemap
-            recursive: If True, recursively load URLs from sitemap indexes. If False, only return the sitemap index entries.
+            url: The sitemap URL
+            recursive: If True, expand sitemap indexes up to the configured crawl depth. If False, only return the sitemap index entries.
         """
+        max_depth = self.state["crawl_depth"] if recursive else 0
+        expander = SitemapIndexExpander(self, max_depth=max_depth, concurrency=self.state["concurrent_requests"])
+        return self._run_async(expander.expand(url))
+    
+    def _run_async(self, coro):
+        """Run a coroutine to completion on a fresh event loop"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+    
+    def _extract_urls_soup(self, xml_content: str) -> Tuple[URLTable, SitemapInfo]:
+        """Parse sitemap XML with BeautifulSoup (slower, but tolerant of malformed input)"""
         sitemap_info = SitemapInfo(
             url="",
             type="unknown",
             urls_count=0
         )
         
-        try:
-            soup = BeautifulSoup(xml_content, 'xml')
-            urls = []
-            
-            # Check if this is a sitemap index
-            sitemapindex = soup.find('sitemapindex')
-            if sitemapindex:
-                sitemap_info.type = "index"
-                
-                # If not recursive, just extract the sitemap URLs from the index
-                if not recursive:
-                    for sitemap in sitemapindex.find_all('sitemap'):
-                        loc = sitemap.find('loc').text if sitemap.find('loc') else None
-                        lastmod = sitemap.find('lastmod').text if sitemap.find('lastmod') else None
-                        
-                        if loc:
-                            url_data = URLData(
-                                url=loc,
-                                lastmod=lastmod
-                            )
-                            urls.append(url_data)
-                    
-                    sitemap_info.urls_count = len(urls)
-                    return urls, sitemap_info
-                
-                # If recursive, load each sitemap and extract its URLs
-                for sitemap in sitemapindex.find_all('sitemap'):
-                    loc = sitemap.find('loc').text if sitemap.find('loc') else None
-                    if loc:
-                        sub_content, _ = _self.load_sitemap(loc)
-                        sub_urls, _ = _self.extract_urls_from_sitemap(sub_content, recursive=True)
-                        urls.extend(sub_urls)
-                
-                sitemap_info.urls_count = len(urls)
-                return urls, sitemap_info
-            
-            # Process regular sitemap
-            sitemap_info.type = "sitemap"
-            sitemap_tag = soup.find('urlset')
-            
-            if not sitemap_tag:
-                return [], sitemap_info
-                
-            for url in soup.find_all('url'):
-                url_data = URLData(
-                    url=url.find('loc').text if url.find('loc') else "",
-                    lastmod=url.find('lastmod').text if url.find('lastmod') else None,
-                    priority=url.find('priority').text if url.find('priority') else None,
-                    changefreq=url.find('changefreq').text if url.find('changefreq') else None,
-                    images=[img.find('image:loc').text for img in url.find_all('image:image') if img.find('image:loc')],
-                    videos=[vid.find('video:content_loc').text for vid in url.find_all('video:video') if vid.find('video:content_loc')],
-                    alternates=[
-                        {"href": link.get('href'), "hreflang": link.get('hreflang')}
-                        for link in url.find_all('xhtml:link')
-                    ]
-                )
+        soup = BeautifulSoup(xml_content, 'xml')
+        urls = []
+        
+        # Check if this is a sitemap index
+        sitemapindex = soup.find('sitemapindex')
+        if sitemapindex:
+            sitemap_info.type = "index"
+            
+            for sitemap in sitemapindex.find_all('sitemap'):
+                loc = sitemap.find('loc').text if sitemap.find('loc') else None
+                lastmod = sitemap.find('lastmod').text if sitemap.find('lastmod') else None
                 
-                if url_data.url:
+                if loc:
+                    url_data = URLData(
+                        url=loc,
+                        lastmod=lastmod
+                    )
                     urls.append(url_data)
             
             sitemap_info.urls_count = len(urls)
-            return urls, sitemap_info
+            return URLTable.from_urls(urls), sitemap_info
+        
+        # Process regular sitemap
+        sitemap_info.type = "sitemap"
+        sitemap_tag = soup.find('urlset')
+        
+        if not sitemap_tag:
+            return URLTable(), sitemap_info
             
-        except Exception as e:
-            st.error(f"Error parsing sitemap: {str(e)}")
-            return [], sitemap_info
+        for url in soup.find_all('url'):
+            url_data = URLData(
+                url=url.find('loc').text if url.find('loc') else "",
+                lastmod=url.find('lastmod').text if url.find('lastmod') else None,
+                priority=url.find('priority').text if url.find('priority') else None,
+                changefreq=url.find('changefreq').text if url.find('changefreq') else None,
+                images=[img.find('image:loc').text for img in url.find_all('image:image') if img.find('image:loc')],
+                videos=[vid.find('video:content_loc').text for vid in url.find_all('video:video') if vid.find('video:content_loc')],
+                alternates=[
+                    {"href": link.get('href'), "hreflang": link.get('hreflang')}
+                    for link in url.find_all('xhtml:link')
+                ]
+            )
+            
+            if url_data.url:
+                urls.append(url_data)
+        
+        sitemap_info.urls_count = len(urls)
+        return URLTable.from_urls(urls), sitemap_info
 
     def parse_date(self, date_str: str) -> Optional[datetime]:
         """Parse date string in various formats"""
@@ -601,26 +2922,75 @@ class SitemapValidator:
         except Exception:
             return None
 
-    async def test_url_async(self, url_data: URLData, session: aiohttp.ClientSession) -> URLData:
+    def parse_dates(self, date_strings: Iterable[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parse W3C Datetime strings (lastmod values) in one vectorized pass
+        
+        Handles every W3C variant: YYYY, YYYY-MM, YYYY-MM-DD and date-times with
+        optional seconds, fractional seconds and a Z or +hh:mm offset. Values
+        without an offset are taken as UTC.
+        
+        Returns:
+            A datetime64[ns] array normalized to UTC (NaT where missing or invalid)
+            and a boolean mask of values that were present but could not be parsed.
+        """
+        values = pd.Series(list(date_strings), dtype=object).str.strip()
+        present = values.notna() & (values != "")
+        parsed = pd.to_datetime(values.where(present), format="ISO8601", utc=True, errors="coerce")
+        invalid = present & parsed.isna()
+        return parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]"), invalid.to_numpy(dtype=bool)
+
+    @contextlib.asynccontextmanager
+    async def _probe(self, session: aiohttp.ClientSession, url: str, headers: Dict[str, str]):
+        """
+        Send the request configured by `probe_mode` and yield the response
+        
+        "head" and "head_fallback" only apply to status audits: with content
+        analysis on, a body is needed and a GET is sent instead. "head_fallback"
+        repeats the request as a GET when the server rejects HEAD (405/501), and
+        "range" asks for just the first `range_bytes` bytes of the page.
+        """
+        mode = self.state["probe_mode"]
+        options = {"timeout": self.state["timeout"], "allow_redirects": False}  # redirects are handled manually
+        
+        if mode in ("head", "head_fallback") and not self.state["content_analysis"]:
+            async with session.head(url, headers=headers, **options) as response:
+                if mode == "head" or response.status not in (405, 501):
+                    yield response
+                    return
+        
+        if mode == "range":
+            headers = dict(headers, Range=f"bytes=0-{self.state['range_bytes'] - 1}")
+        async with session.get(url, headers=headers, **options) as response:
+            yield response
+
+    async def test_url_async(
+        self,
+        url_data: URLData,
+        session: aiohttp.ClientSession,
+        limiter: Optional[HostRateLimiter] = None,
+        resolver: Optional[RedirectResolver] = None
+    ) -> URLData:
         """Test a single URL asynchronously and return results"""
         url = url_data.url
         headers = {"User-Agent": self.state["user_agent"]}
+        error_class = None
         
         try:
+            if limiter:
+                await limiter.acquire(url)
             start_time = time.time()
-            async with session.get(
-                url, 
-                headers=headers, 
-                timeout=self.state["timeout"],
-                allow_redirects=False  # Don't automatically follow redirects
-            ) as response:
+            async with self._probe(session, url, headers) as response:
                 end_time = time.time()
                 response_time = (end_time - start_time) * 1000
                 
                 status_code = response.status
+                ranged = "Range" in response.request_info.headers
+                if ranged and status_code == 206:
+                    status_code = 200  # the partial body answers a plain GET as well
                 
                 # Handle redirects manually
-                if status_code in (301, 302, 303, 307, 308):
+                if status_code in REDIRECT_STATUSES:
                     url_data.redirected = True
                     url_data.final_url = response.headers.get('Location')
                     url_data.status_group = "3xx"
@@ -634,9 +3004,20 @@ class SitemapValidator:
                 else:
                     url_data.status_group = "error"
                 
+                if status_code in (429, 503):
+                    url_data.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                
                 # Get content type and length
                 content_type = response.headers.get("Content-Type", "")
                 content_length = int(response.headers.get("Content-Length", "0")) if "Content-Length" in response.headers else 0
+                content_range = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+                if content_range:
+                    content_length = int(content_range.group(1))  # full size, not the partial body
+                
+                # Never read past the requested range, even if the server ignored it; stopping
+                # there is deliberate, so only max_body_bytes counts as truncation
+                max_body = min(self.state["range_bytes"], self.state["max_body_bytes"]) if ranged else self.state["max_body_bytes"]
+                transferred = 0
                 
                 # Check for HTML content and extract more info if enabled
                 if (self.state["content_analysis"] and 
@@ -644,45 +3025,45 @@ class SitemapValidator:
                     "text/html" in content_type.lower() and
                     status_code == 200):  # Only analyze content for 200 responses
                     try:
-                        html = await response.text()
-                        soup = BeautifulSoup(html, 'html.parser')
-                        
-                        # Extract page title
-                        title_tag = soup.find('title')
-                        page_title = title_tag.text if title_tag else None
-                        
-                        # Extract meta description
-                        meta_desc = soup.find('meta', attrs={'name': 'description'})
-                        meta_description = meta_desc.get('content') if meta_desc else None
-                        
-                        # Check indexability
-                        robots_meta = soup.find('meta', attrs={'name': 'robots'})
-                        indexability = True
-                        if robots_meta and robots_meta.get('content'):
-                            indexability = 'noindex' not in robots_meta.get('content').lower()
-                        
-                        # Extract canonical URL
-                        canonical = soup.find('link', attrs={'rel': 'canonical'})
-                        canonical_url = canonical.get('href') if canonical else None
-                        
-                        # Count H1 tags
-                        h1_count = len(soup.find_all('h1'))
+                        # Fingerprints need the body text, not just the head
+                        fingerprint = self.state["detect_duplicates"]
+                        data = await self._read_head(response, min(self.state["head_bytes"], max_body), stop_at_h1=not fingerprint)
+                        transferred = len(data)
+                        page = await self.html_pool.analyze(data, response.charset, fingerprint)
                         
                         # Update URL data with content info
-                        url_data.page_title = page_title
-                        url_data.meta_description = meta_description
-                        url_data.indexability = indexability
-                        url_data.canonical_url = canonical_url
-                        url_data.h1_count = h1_count
+                        url_data.page_title = page["page_title"]
+                        url_data.meta_description = page["meta_description"]
+                        url_data.indexability = page["indexability"]
+                        url_data.canonical_url = page["canonical_url"]
+                        url_data.has_h1 = page["has_h1"]
+                        url_data.simhash = page.get("simhash")
+                        url_data.minhash = page.get("minhash")
                     except Exception as e:
                         url_data.error = f"Content analysis error: {str(e)}"
                 
+                # Without Content-Length the size is only known by reading the body, in bounded chunks
+                truncated = content_length > self.state["max_body_bytes"]
+                if ("Content-Length" not in response.headers and not content_range and
+                    self.state["measure_body_size"] and
+                    response.method != "HEAD" and
+                    status_code not in REDIRECT_STATUSES):
+                    drained, cut_short = await self._drain_body(response, max_body - transferred)
+                    truncated = cut_short and not ranged
+                    transferred += drained
+                    content_length = transferred
+                
                 # Update URL data
                 url_data.status_code = status_code
                 url_data.response_time = response_time
                 url_data.content_type = content_type
                 url_data.content_length = content_length
-                
+                url_data.transferred_bytes = transferred
+                url_data.truncated = truncated
+            
+            if url_data.redirected and url_data.final_url and self.state["follow_redirects"]:
+                await self._follow_redirect(url_data, session, limiter, resolver)
+            
             return url_data
             
         except asyncio.TimeoutError:
@@ -693,46 +3074,266 @@ class SitemapValidator:
             return url_data
             
         except Exception as e:
+            if isinstance(e, (aiohttp.ClientConnectionError, ConnectionError)):
+                error_class = "connection"
             url_data.status_code = "Error"
             url_data.response_time = 0
             url_data.status_group = "error"
             url_data.error = str(e)
             return url_data
+        
+        finally:
+            if error_class is None and isinstance(url_data.status_code, int):
+                error_class = RETRYABLE_STATUSES.get(url_data.status_code)
+            # Rebind rather than append: rows of a URLTable share the frame's list objects
+            url_data.attempts = url_data.attempts + [{
+                "status_code": url_data.status_code,
+                "response_time": url_data.response_time,
+                "error": url_data.error,
+                "error_class": error_class
+            }]
+
+    @staticmethod
+    async def _read_head(response: aiohttp.ClientResponse, max_bytes: int, stop_at_h1: bool = True) -> bytes:
+        """Read the page until the first H1 after the <head> has closed (if `stop_at_h1`), or `max_bytes`"""
+        chunks = []
+        size = 0
+        head_end = None
+        while size < max_bytes:
+            chunk = await response.content.read(min(16384, max_bytes - size))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            if not stop_at_h1:
+                continue
+            # Scan from a few bytes back so tags split across chunks are found
+            start = max(0, size - len(chunk) - 8)
+            data = b"".join(chunks)
+            if head_end is None:
+                match = HEAD_END.search(data, start)
+                head_end = match.end() if match else None
+            if head_end is not None and H1_END.search(data, max(start, head_end)):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _drain_body(response: aiohttp.ClientResponse, max_bytes: int) -> Tuple[int, bool]:
+        """Read and discard the rest of the body; returns the bytes read and whether `max_bytes` cut it short"""
+        size = 0
+        while size < max_bytes:
+            chunk = await response.content.read(min(65536, max_bytes - size))
+            if not chunk:
+                return size, False
+            size += len(chunk)
+        return size, bool(await response.content.read(1))
+
+    async def _follow_redirect(self, url_data: URLData, session: aiohttp.ClientSession, limiter: Optional[HostRateLimiter], resolver: Optional[RedirectResolver]):
+        """Resolve the rest of a redirect chain through the shared resolver"""
+        resolver = resolver or RedirectResolver(self, self.state["max_redirects"])
+        location = urllib.parse.urljoin(url_data.url, url_data.final_url)
+        first_hop = {
+            "url": url_data.url,
+            "status_code": url_data.status_code,
+            "location": location,
+            "time_ms": round(url_data.response_time, 2)
+        }
+        
+        resolved = await resolver.resolve(location, session, limiter)
+        url_data.redirect_chain = [first_hop] + resolved["chain"]
+        url_data.final_url = resolved["final_url"]
+        url_data.final_status_code = resolved["final_status_code"]
+        if url_data.url in (hop["url"] for hop in resolved["chain"]):
+            url_data.error = "Redirect loop"
+        elif len(url_data.redirect_chain) > resolver.max_hops:
+            url_data.error = f"More than {resolver.max_hops} redirects"
+        elif resolved["error"]:
+            url_data.error = resolved["error"]
+
+    def validation_engine(self) -> ValidationEngine:
+        return ValidationEngine(
+            self,
+            workers=self.state["concurrent_requests"],
+            queue_size=self.state["pipeline_queue_size"],
+            limit_per_host=self.state["limit_per_host"],
+            adaptive=self.state["adaptive_concurrency"],
+            retry_policy=RetryPolicy(self.state["retry_budget"]) if self.state["retry_enabled"] else None
+        )
+
+    async def test_urls_batch(
+        self,
+        urls: Iterable[URLData],
+        job: Optional[ValidationJob] = None,
+        on_result=None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[URLData]:
+        """
+        Test multiple URLs in parallel using asyncio
+        
+        Args:
+            urls: The URLs to test
+            job: Optional ValidationJob that results are checkpointed to
+            on_result: Optional callable receiving each result; replaces the
+                progress bar, which needs the Streamlit script thread
+            cancel_event: Optional event that stops the run once set
+        """
+        progress = None if on_result else stqdm(total=len(urls) if hasattr(urls, "__len__") else None, desc="Testing URLs")
+        results = []
+        checkpointed = 0
+        try:
+            async with self.validation_engine() as engine:
+                async for result in engine.run(urls):
+                    results.append(result)
+                    if job and len(results) - checkpointed >= job.CHECKPOINT_EVERY:
+                        job.checkpoint(results[checkpointed:])
+                        checkpointed = len(results)
+                    if on_result:
+                        on_result(result)
+                    else:
+                        progress.set_postfix_str(engine.busiest_hosts(), refresh=False)
+                        progress.update(1)
+                    if cancel_event and cancel_event.is_set():
+                        break
+                self.state["host_stats"] = engine.scheduler.host_stats()
+        finally:
+            # Also runs when a rerun interrupts the script, so finished URLs are never refetched
+            if job and len(results) > checkpointed:
+                job.checkpoint(results[checkpointed:])
+            if progress:
+                progress.close()
+        return results
+
+    def rate_limiter(self) -> HostRateLimiter:
+        return HostRateLimiter(self.state["rate_limit_rps"], self.state["rate_limit_burst"])
+
+    def test_urls(self, urls: URLTable, job: Optional[ValidationJob] = None, **run_options) -> URLTable:
+        """Run asynchronous URL testing with progress tracking; `run_options` go to test_urls_batch"""
+        results = URLTable.from_urls(self._run_async(self.test_urls_batch(urls, job, **run_options)))
+        self.result_store.save(results)
+        return results
+
+    def test_urls_incremental(self, urls: URLTable, job: Optional[ValidationJob] = None, **run_options) -> Tuple[URLTable, int]:
+        """
+        Retest only URLs that are new, have a changed lastmod or a stale result
+        
+        Returns the fresh results merged with the stored ones, and the number
+        of URLs whose stored result was reused.
+        """
+        retest, cached = self.result_store.plan(urls, self.state["freshness_hours"] * 3600)
+        if job and len(cached):
+            job.checkpoint(cached)
+        to_test = URLTable(urls.frame[retest])
+        results = self.test_urls(to_test, job, **run_options) if len(to_test) else URLTable()
+        return URLTable.concat([results, cached]), len(cached)
+
+    @property
+    def jobs_dir(self) -> Path:
+        return Path(self.state["cache_dir"]) / "jobs"
+
+    def create_job(
+        self,
+        urls: URLTable,
+        sitemap_url: Optional[str] = None,
+        sample_design: Optional[Dict] = None,
+        owner: Optional[str] = None,
+        sitemap_complete: bool = True
+    ) -> ValidationJob:
+        """
+        Start a resumable validation job for `urls`, listed only to `owner`
+        
+        `sitemap_complete` is False when `urls` came from a sitemap that was
+        only partly loaded, so a sample of them isn't extrapolated.
+        """
+        ValidationJob.prune(self.jobs_dir, self.state["job_retention_hours"] * 3600)
+        return ValidationJob.create(
+            self.jobs_dir, urls, sitemap_url=sitemap_url, sample_design=sample_design, owner=owner, sitemap_complete=sitemap_complete
+        )
+
+    def run_job(self, job: ValidationJob, **run_options) -> Tuple[URLTable, int]:
+        """
+        Test the URLs of a job that have no checkpointed result yet
+        
+        Returns every result of the job and the number of stored results
+        reused by incremental validation in this run. A cancelled job is left
+        unfinished so it can be resumed.
+        """
+        if not job.lock():
+            raise RuntimeError(f"Job {job.job_id} is already running in another session")
+        try:
+            remaining = job.remaining()
+            reused = 0
+            if len(remaining):
+                if self.state["incremental_mode"]:
+                    _, reused = self.test_urls_incremental(remaining, job, **run_options)
+                else:
+                    self.test_urls(remaining, job, **run_options)
+            cancel_event = run_options.get("cancel_event")
+            if not (cancel_event and cancel_event.is_set()):
+                job.finish()
+        finally:
+            job.unlock()
+        return job.results(), reused
 
-    async def test_urls_batch(self, urls: List[URLData]) -> List[URLData]:
-        """Test multiple URLs in parallel using asyncio"""
-        connector = aiohttp.TCPConnector(limit=self.state["concurrent_requests"])
-        timeout = aiohttp.ClientTimeout(total=self.state["timeout"])
+    async def pipeline_async(self, url: str, recursive: bool = True, progress_callback=None) -> Tuple[List[URLData], SitemapInfo, Dict]:
+        """
+        Load a sitemap and test its URLs in a single pass.
+        
+        Parsed <url> entries go straight into the ValidationEngine's bounded
+        queue, whose workers test them while the rest of the sitemap (and the
+        other children of a sitemap index) is still downloading. A full queue
+        pauses the parser, and loading stops once `max_urls_to_check` URLs have
+        been queued.
         
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            tasks = []
+        Args:
+            url: The sitemap URL
+            recursive: If True, expand sitemap indexes up to the configured crawl depth
+            progress_callback: Optional callable receiving (tested, queued) counts
+        """
+        limit = self.state["max_urls_to_check"]
+        results = []
+        cut_off = False
+        
+        async with self.validation_engine() as engine:
+            async def sink(url_data: URLData) -> bool:
+                nonlocal cut_off
+                if engine.submitted >= limit:
+                    cut_off = True
+                    return False
+                await engine.submit(url_data)
+                return True
             
-            for url_data in urls:
-                # Add rate limiting if needed
-                if self.state["rate_limit"] > 0:
-                    await asyncio.sleep(self.state["rate_limit"] / 1000.0)
-                
-                task = asyncio.ensure_future(self.test_url_async(url_data, session))
-                tasks.append(task)
+            async def produce() -> Tuple[URLTable, SitemapInfo, Dict]:
+                max_depth = self.state["crawl_depth"] if recursive else 0
+                expander = SitemapIndexExpander(self, max_depth=max_depth, concurrency=self.state["concurrent_requests"], sink=sink)
+                try:
+                    urls, sitemap_info, info = await expander.expand(url)
+                    # Entries that were collected instead of streamed (an unexpanded index) are tested as well
+                    for url_data in urls:
+                        if not await sink(url_data):
+                            break
+                    return urls, sitemap_info, info
+                finally:
+                    await engine.close()
             
-            results = []
-            for future in stqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Testing URLs"):
-                result = await future
+            producer = asyncio.create_task(produce())
+            async for result in engine.results():
                 results.append(result)
-            
-            return results
+                if progress_callback:
+                    progress_callback(engine.completed, engine.submitted)
+            _, sitemap_info, info = await producer
+            self.state["host_stats"] = engine.scheduler.host_stats()
+        
+        info["complete"] = not cut_off  # every URL in the sitemap was loaded
+        return results, sitemap_info, info
 
-    def test_urls(self, urls: List[URLData]) -> List[URLData]:
-        """Run asynchronous URL testing with progress tracking"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            results = loop.run_until_complete(self.test_urls_batch(urls))
-            return results
-        finally:
-            loop.close()
+    def run_pipeline(self, url: str, recursive: bool = True, progress_callback=None) -> Tuple[URLTable, SitemapInfo, Dict]:
+        """Load and test a sitemap in pipelined mode; returns the tested URLs"""
+        results, sitemap_info, info = self._run_async(self.pipeline_async(url, recursive, progress_callback))
+        results = URLTable.from_urls(results)
+        self.result_store.save(results)
+        return results, sitemap_info, info
 
-    def generate_html_sitemap(self, urls: List[URLData]) -> str:
+    def generate_html_sitemap(self, urls: URLTable) -> str:
         """Generate an interactive HTML sitemap from URL data"""
         html = """
         <!DOCTYPE html>
@@ -1244,19 +3845,23 @@ class SitemapValidator:
         </html>
         """
         
-        # Convert the URLData objects to simple dictionaries
-        url_dicts = [url.to_dict() for url in urls]
-        
-        # Convert to JSON for embedding in JavaScript
-        url_json = json.dumps(url_dicts)
+        # Serialize the URL table straight to JSON for embedding in JavaScript
+        url_json = urls.to_json()
         
         # Replace the placeholder with actual data
         html = html.replace("PLACEHOLDER_URL_DATA", url_json)
         
         return html
 
-    def analyze_sitemap_health(self, urls: List[URLData], results: List[URLData]) -> AnalysisResult:
-        """Analyze sitemap health and generate recommendations"""
+    def analyze_sitemap_health(self, urls: URLTable, results: URLTable, sitemap_urls: Optional[URLTable] = None) -> AnalysisResult:
+        """
+        Analyze sitemap health and generate recommendations
+        
+        `sitemap_urls` is the whole sitemap, in which hreflang and canonical
+        targets are looked up. Pass None when it isn't known (a sample of
+        another sitemap, or a pipeline run cut off at max_urls_to_check): the
+        "not in the sitemap" checks are then skipped rather than guessed.
+        """
         analysis = AnalysisResult()
         
         # Calculate metrics
@@ -1264,9 +3869,10 @@ class SitemapValidator:
         if total_urls == 0:
             return analysis
         
-        success_count = sum(1 for r in results if r.status_group == "2xx")
-        redirect_count = sum(1 for r in results if r.status_group == "3xx")
-        error_count = sum(1 for r in results if r.status_group in ["4xx", "5xx", "error"])
+        status_counts = results.status_counts()
+        success_count = status_counts["2xx"]
+        redirect_count = status_counts["3xx"]
+        error_count = status_counts["4xx"] + status_counts["5xx"] + status_counts["error"]
         
         # Calculate health score (0-100)
         health_score = (success_count / total_urls) * 100
@@ -1285,6 +3891,109 @@ class SitemapValidator:
                 "message": f"{error_count} URLs are returning errors"
             })
         
+        # Followed redirects: chains hold every hop including the final response
+        chain_lengths = results.list_lengths("redirect_chain")
+        redirect_chain_count = int(np.count_nonzero(chain_lengths > 2))
+        redirect_loop_count = int(results.frame["error"].isin(["Redirect loop"]).sum())
+        final_status = pd.to_numeric(results.frame["final_status_code"], errors="coerce")
+        redirect_to_error_count = int((final_status >= 400).sum())
+        
+        if redirect_chain_count > 0:
+            analysis.issues.append({
+                "type": "warning",
+                "message": f"{redirect_chain_count} URLs go through more than one redirect"
+            })
+        
+        if redirect_loop_count > 0:
+            analysis.issues.append({
+                "type": "error",
+                "message": f"{redirect_loop_count} URLs are caught in redirect loops"
+            })
+        
+        if redirect_to_error_count > 0:
+            analysis.issues.append({
+                "type": "error",
+                "message": f"{redirect_to_error_count} URLs redirect to a page that returns an error"
+            })
+        
+        # Retried URLs that came good are flaky rather than healthy
+        retried = results.list_lengths("attempts") > 1
+        retried_count = int(np.count_nonzero(retried))
+        flaky_count = int(np.count_nonzero(retried & results.frame["status_group"].eq("2xx").to_numpy()))
+        if flaky_count > 0:
+            analysis.issues.append({
+                "type": "warning",
+                "message": f"{flaky_count} URLs only succeeded after a retry"
+            })
+        
+        truncated_count = int(results.frame["truncated"].eq(True).sum())
+        if truncated_count > 0:
+            analysis.issues.append({
+                "type": "warning",
+                "message": f"{truncated_count} URLs return bodies larger than {self.state['max_body_bytes'] // (1024 * 1024)} MB"
+            })
+        
+        # Near-duplicates, from the fingerprints taken during content analysis
+        analysis.duplicates = self.find_duplicates(results)
+        duplicate_count = analysis.duplicates["duplicate_urls"]
+        if duplicate_count > 0:
+            analysis.issues.append({
+                "type": "warning",
+                "message": f"{duplicate_count} URLs are near-duplicates of other pages ({analysis.duplicates['cluster_count']} clusters)"
+            })
+        
+        if self.state["check_hreflang"]:
+            hreflang = analysis.structure["hreflang"] = self.validate_hreflang(
+                sitemap_urls if sitemap_urls is not None else urls, complete=sitemap_urls is not None
+            )
+            if hreflang["missing_return_link"] > 0:
+                analysis.issues.append({
+                    "type": "error",
+                    "message": f"{hreflang['missing_return_link']} hreflang alternates don't link back (missing return links)"
+                })
+                analysis.recommendations.append(
+                    "Make hreflang annotations reciprocal: every alternate must list the page that points to it"
+                )
+            if hreflang["missing_self_reference"] > 0:
+                analysis.issues.append({
+                    "type": "warning",
+                    "message": f"{hreflang['missing_self_reference']} URLs with hreflang alternates don't list themselves"
+                })
+            if hreflang["not_in_sitemap"] > 0:
+                analysis.issues.append({
+                    "type": "warning",
+                    "message": f"{hreflang['not_in_sitemap']} hreflang alternates point to URLs that are not in the sitemap"
+                })
+        
+        if self.state["check_canonical"]:
+            canonical = analysis.structure["canonical"] = self.validate_canonicals(results, sitemap_urls)
+            if canonical["canonicalized"] > 0:
+                analysis.issues.append({
+                    "type": "warning",
+                    "message": f"{canonical['canonicalized']} URLs declare a different page in the sitemap as canonical"
+                })
+            if canonical["outside_sitemap"] > 0:
+                analysis.issues.append({
+                    "type": "warning",
+                    "message": f"{canonical['outside_sitemap']} URLs declare a canonical that is not in the sitemap"
+                })
+            if canonical["chains"] > 0:
+                analysis.issues.append({
+                    "type": "warning",
+                    "message": f"{canonical['chains']} canonicals point to a page that is itself canonicalized elsewhere"
+                })
+            if canonical["canonicalized"] or canonical["outside_sitemap"]:
+                analysis.recommendations.append(
+                    "List only canonical URLs in the sitemap, and make sure every canonical target is listed"
+                )
+        
+        robots_blocked_count = int(urls.frame["robots_blocked"].eq(True).sum())
+        if robots_blocked_count > 0:
+            analysis.issues.append({
+                "type": "error",
+                "message": f"{robots_blocked_count} URLs in the sitemap are blocked by robots.txt"
+            })
+        
         # Generate recommendations
         if redirect_count > 0:
             analysis.recommendations.append(
@@ -1296,14 +4005,39 @@ class SitemapValidator:
                 "Fix or remove broken URLs from the sitemap"
             )
         
+        if duplicate_count > 0:
+            analysis.recommendations.append(
+                "Canonicalize or drop near-duplicate pages (faceted filters, session variants) to save crawl budget"
+            )
+        
+        if robots_blocked_count > 0:
+            analysis.recommendations.append(
+                "Remove URLs blocked by robots.txt from the sitemap, or allow them to be crawled"
+            )
+        
         # Check lastmod dates
-        six_months_ago = datetime.now(timezone.utc) - timedelta(days=180)
-        old_urls = 0
-        for url in urls:
-            if url.lastmod:
-                parsed_date = self.parse_date(url.lastmod)
-                if parsed_date and parsed_date < six_months_ago:
-                    old_urls += 1
+        lastmod_values = urls.values("lastmod")
+        lastmods, invalid_lastmod = self.parse_dates(lastmod_values)
+        now = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "ns")
+        age_days = (now - lastmods) / np.timedelta64(1, "D")  # NaN where lastmod is missing or invalid
+        parsed_ages = age_days[~np.isnan(age_days)]
+        
+        old_urls = int(np.count_nonzero(parsed_ages > 180))
+        invalid_lastmod_count = int(invalid_lastmod.sum())
+        freshness_counts, _ = np.histogram(parsed_ages, bins=[-np.inf, 0, 7, 30, 90, 180, 365, np.inf])
+        lastmod_freshness = dict(zip(
+            ["In the future", "< 7 days", "7-30 days", "1-3 months", "3-6 months", "6-12 months", "> 1 year"],
+            freshness_counts.tolist()
+        ))
+        
+        if invalid_lastmod_count > 0:
+            analysis.issues.append({
+                "type": "warning",
+                "message": f"{invalid_lastmod_count} URLs have lastmod values that are not valid W3C Datetime"
+            })
+            analysis.recommendations.append(
+                "Use W3C Datetime for lastmod (e.g. 2024-02-26 or 2024-02-26T15:30:00+00:00)"
+            )
         
         if old_urls > 0:
             analysis.recommendations.append(
@@ -1311,30 +4045,262 @@ class SitemapValidator:
             )
         
         # Store metrics
+        response_times = results.numeric("response_time")
         analysis.metrics = {
             "total_urls": total_urls,
             "success_count": success_count,
             "redirect_count": redirect_count,
             "error_count": error_count,
             "old_urls": old_urls,
-            "avg_response_time": round(sum(r.response_time for r in results if isinstance(r.response_time, (int, float))) / len(results) if results else 0, 2),
-            "median_response_time": np.median([r.response_time for r in results if isinstance(r.response_time, (int, float))]) if results else 0,
-            "images_count": sum(len(url.images) for url in urls),
-            "videos_count": sum(len(url.videos) for url in urls),
-            "alternates_count": sum(len(url.alternates) for url in urls)
+            "redirect_chain_count": redirect_chain_count,
+            "redirect_loop_count": redirect_loop_count,
+            "redirect_to_error_count": redirect_to_error_count,
+            "robots_blocked_count": robots_blocked_count,
+            "retried_count": retried_count,
+            "flaky_count": flaky_count,
+            "truncated_count": truncated_count,
+            "duplicate_count": duplicate_count,
+            "missing_lastmod_count": int(total_urls - len(parsed_ages) - invalid_lastmod_count),
+            "invalid_lastmod_count": invalid_lastmod_count,
+            "invalid_lastmod_samples": [value for value, invalid in zip(lastmod_values, invalid_lastmod) if invalid][:10],
+            "future_lastmod_count": lastmod_freshness["In the future"],
+            "lastmod_freshness": lastmod_freshness,
+            "avg_response_time": round(float(response_times.sum()) / len(results) if len(results) else 0, 2),
+            "median_response_time": np.median(response_times) if len(results) else 0,
+            "images_count": int(urls.list_lengths("images").sum()),
+            "videos_count": int(urls.list_lengths("videos").sum()),
+            "alternates_count": int(urls.list_lengths("alternates").sum())
+        }
+        
+        return analysis
+
+    def validate_hreflang(self, urls: URLTable, complete: bool = True, max_samples: int = 20) -> Dict:
+        """
+        Cross-check the hreflang alternates declared in the sitemap
+        
+        One pass indexes URL -> set of alternate hrefs, then a single pass over
+        the alternate entries checks each for a self-reference, presence in
+        the sitemap and a return link with O(1) hash lookups. Unless `urls` is
+        the `complete` sitemap, alternates outside it can't be checked and are
+        skipped.
+        """
+        in_sitemap = {_clean_url(url) for url in urls.values("url")}
+        index = {}
+        for url, alternates in zip(urls.values("url"), urls.values("alternates")):
+            if alternates:
+                index[_clean_url(url)] = {_clean_url(alternate["href"]) for alternate in alternates if alternate.get("href")}
+        
+        counts = Counter()
+        samples = {"missing_self_reference": [], "not_in_sitemap": [], "missing_return_link": []}
+        
+        def report(problem: str, sample: Dict):
+            counts[problem] += 1
+            if len(samples[problem]) < max_samples:
+                samples[problem].append(sample)
+        
+        for url, hrefs in index.items():
+            if url not in hrefs:
+                report("missing_self_reference", {"url": url})
+            for href in hrefs:
+                counts["alternates"] += 1
+                if href == url:
+                    continue
+                if href not in in_sitemap:
+                    if complete:
+                        report("not_in_sitemap", {"url": url, "alternate": href})
+                elif url not in index.get(href, ()):
+                    report("missing_return_link", {"url": url, "alternate": href})
+        
+        return {
+            "urls_with_alternates": len(index),
+            "alternates": counts["alternates"],
+            "missing_self_reference": counts["missing_self_reference"],
+            "not_in_sitemap": counts["not_in_sitemap"],
+            "missing_return_link": counts["missing_return_link"],
+            "complete": complete,
+            "samples": samples
+        }
+
+    def validate_canonicals(self, results: URLTable, sitemap_urls: Optional[URLTable] = None, max_samples: int = 20) -> Dict:
+        """
+        Check the canonical links found by content analysis against the sitemap
+        
+        Canonicals are resolved against their page and indexed URL -> canonical;
+        a canonical pointing to another sitemap URL or outside the sitemap is
+        reported, as is one whose target is canonicalized again (a chain).
+        Without `sitemap_urls` only the tested URLs are known to be in the
+        sitemap, and canonicals outside them aren't reported.
+        """
+        complete = sitemap_urls is not None
+        in_sitemap = {_clean_url(url) for url in (sitemap_urls if complete else results).values("url")}
+        index = {
+            _clean_url(url): _clean_url(urllib.parse.urljoin(url, canonical))
+            for url, canonical in zip(results.values("url"), results.values("canonical_url"))
+            if canonical
+        }
+        
+        counts = Counter()
+        samples = {"canonicalized": [], "outside_sitemap": [], "chains": []}
+        for url, target in index.items():
+            if target == url:
+                counts["self"] += 1
+                continue
+            problem = "canonicalized" if target in in_sitemap else "outside_sitemap"
+            if problem == "canonicalized" or complete:
+                counts[problem] += 1
+                if len(samples[problem]) < max_samples:
+                    samples[problem].append({"url": url, "canonical": target})
+            if index.get(target, target) != target:
+                counts["chains"] += 1
+                if len(samples["chains"]) < max_samples:
+                    samples["chains"].append({"url": url, "canonical": target, "canonical_of_canonical": index[target]})
+        
+        return {
+            "with_canonical": len(index),
+            "self_referencing": counts["self"],
+            "canonicalized": counts["canonicalized"],
+            "outside_sitemap": counts["outside_sitemap"],
+            "chains": counts["chains"],
+            "complete": complete,
+            "samples": samples
+        }
+
+    def find_duplicates(self, results: URLTable, max_clusters: int = 100, max_urls: int = 50) -> Dict:
+        """Cluster near-duplicate pages by their content fingerprints"""
+        clusters = DuplicateIndex().clusters(results.values("simhash"), results.values("minhash"))
+        urls = results.values("url")
+        return {
+            "cluster_count": len(clusters),
+            "duplicate_urls": sum(len(cluster) - 1 for cluster in clusters),  # pages beyond one per cluster
+            "clusters": [
+                {"size": len(cluster), "urls": [urls[i] for i in cluster[:max_urls]]}
+                for cluster in clusters[:max_clusters]
+            ]
+        }
+
+    def sample_urls(self, urls: URLTable, n: int) -> Tuple[URLTable, Optional[Dict]]:
+        """
+        Pick the URLs to test according to the sampling settings
+        
+        Returns the sample and its design, or the first `n` URLs and None when
+        stratified sampling is off or the whole table fits in the budget.
+        """
+        if self.state["sample_strategy"] != "stratified" or len(urls) <= n:
+            return urls[:n], None
+        
+        weights = None
+        if self.state["sample_weighting"] == "priority":
+            weights = pd.to_numeric(urls.frame["priority"], errors="coerce").fillna(0.5).clip(0.05, 1.0).to_numpy(dtype=float)
+        elif self.state["sample_weighting"] == "lastmod":
+            lastmods, _ = self.parse_dates(urls.values("lastmod"))
+            now = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "ns")
+            age_days = np.clip((now - lastmods) / np.timedelta64(1, "D"), 0, None)
+            # Recently modified URLs are more likely to be picked; missing dates get the floor weight
+            weights = np.nan_to_num(1.0 / (1.0 + age_days / 30.0), nan=0.0).clip(0.05, 1.0)
+        
+        sampler = StratifiedSampler(
+            strata=self.state["sample_strata"],
+            seed=self.state["sample_seed"],
+            path_depth=self.state["sample_path_depth"]
+        )
+        return sampler.sample(urls, n, weights)
+    
+    @staticmethod
+    def _stratified_estimate(results: URLTable, y: pd.Series, design: Dict) -> Tuple[float, float, int]:
+        """
+        Hajek estimate of the population mean of `y` from a stratified sample
+        
+        Returns the estimate, its standard error and the number of population
+        URLs in the strata that contributed observations.
+        """
+        data = pd.DataFrame({
+            "stratum": results.frame["stratum"],
+            "d": pd.to_numeric(results.frame["sample_weight"], errors="coerce"),
+            "y": pd.to_numeric(y, errors="coerce")
+        }).dropna()
+        if data.empty:
+            return float("nan"), float("nan"), 0
+        
+        data["dy"] = data["d"] * data["y"]
+        groups = data.groupby("stratum")
+        sum_d = groups["d"].sum()
+        means = groups["dy"].sum() / sum_d
+        counts = groups.size()
+        residuals = (data["d"] * (data["y"] - data["stratum"].map(means))) ** 2
+        
+        sizes = pd.Series({stratum: design["strata"][stratum]["size"] for stratum in means.index}, dtype=float)
+        fpc = (1 - counts / sizes).clip(lower=0)
+        variances = fpc * counts / (counts - 1).clip(lower=1) * residuals.groupby(data["stratum"]).sum() / sum_d ** 2
+        # A single observation says nothing about its stratum's spread: borrow the pooled variance
+        pooled = data["y"].var(ddof=1) if len(data) > 1 else 0.0
+        variances[counts < 2] = (fpc * pooled / counts)[counts < 2]
+        
+        shares = sizes / sizes.sum()
+        estimate = float((shares * means).sum())
+        std_error = float(np.sqrt((shares ** 2 * variances).sum()))
+        return estimate, std_error, int(sizes.sum())
+    
+    def extrapolate_health(self, analysis: AnalysisResult, results: URLTable, design: Dict, confidence: float = 0.95) -> AnalysisResult:
+        """Extrapolate sample metrics to the whole sitemap with confidence intervals"""
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        population = design["population"]
+        status = results.frame["status_group"]
+        lastmods, invalid_lastmod = self.parse_dates(results.values("lastmod"))
+        now = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "ns")
+        age_days = (now - lastmods) / np.timedelta64(1, "D")
+        missing_lastmod = np.isnan(age_days) & ~invalid_lastmod
+        
+        index = results.frame.index
+        indicators = {
+            "success_count": status.eq("2xx"),
+            "redirect_count": status.eq("3xx"),
+            "error_count": status.isin(["4xx", "5xx", "error"]),
+            "old_urls": pd.Series(np.nan_to_num(age_days, nan=0.0) > 180, index=index),
+            "invalid_lastmod_count": pd.Series(invalid_lastmod, index=index),
+            "missing_lastmod_count": pd.Series(missing_lastmod, index=index)
+        }
+        
+        estimates = {}
+        covered = 0
+        for name, indicator in indicators.items():
+            rate, std_error, covered = self._stratified_estimate(results, indicator.astype(float), design)
+            low, high = max(0.0, rate - z * std_error), min(1.0, rate + z * std_error)
+            estimates[name] = {
+                "estimate": int(round(rate * population)),
+                "ci_low": int(round(low * population)),
+                "ci_high": int(round(high * population)),
+                "rate": round(rate, 4)
+            }
+        
+        mean, std_error, _ = self._stratified_estimate(results, results.frame["response_time"], design)
+        estimates["avg_response_time"] = {
+            "estimate": round(mean, 2),
+            "ci_low": round(max(0.0, mean - z * std_error), 2),
+            "ci_high": round(mean + z * std_error, 2)
         }
         
+        success = estimates["success_count"]
+        analysis.health_score = round(success["rate"] * 100, 2)
+        analysis.metrics["extrapolated"] = {
+            "population": population,
+            "sample_size": len(results),
+            "coverage": round(covered / population, 4) if population else 0,
+            "confidence": confidence,
+            "health_score_ci": (round(success["ci_low"] / population * 100, 2), round(success["ci_high"] / population * 100, 2)),
+            "metrics": estimates
+        }
         return analysis
 
-    def generate_visualizations(self, results: List[URLData]) -> Dict:
+    def generate_visualizations(self, results: URLTable, analysis: Optional[AnalysisResult] = None) -> Dict:
         """Generate visualization data for the sitemap analysis"""
         # Status distribution pie chart
+        group_counts = results.status_counts()
         status_counts = {
-            "Success (2xx)": sum(1 for r in results if r.status_group == "2xx"),
-            "Redirects (3xx)": sum(1 for r in results if r.status_group == "3xx"),
-            "Client Errors (4xx)": sum(1 for r in results if r.status_group == "4xx"),
-            "Server Errors (5xx)": sum(1 for r in results if r.status_group == "5xx"),
-            "Other Errors": sum(1 for r in results if r.status_group == "error")
+            "Success (2xx)": group_counts["2xx"],
+            "Redirects (3xx)": group_counts["3xx"],
+            "Client Errors (4xx)": group_counts["4xx"],
+            "Server Errors (5xx)": group_counts["5xx"],
+            "Other Errors": group_counts["error"]
         }
         
         status_fig = px.pie(
@@ -1362,7 +4328,7 @@ class SitemapValidator:
         )
         
         # Response time histogram
-        response_times = [r.response_time for r in results if isinstance(r.response_time, (int, float))]
+        response_times = results.numeric("response_time")
         
         time_fig = px.histogram(
             x=response_times,
@@ -1385,12 +4351,12 @@ class SitemapValidator:
         
         # Content type distribution
         content_types = {}
-        for r in results:
-            if not r.content_type:
+        for content_type in results.values("content_type"):
+            if not content_type:
                 continue
             
             # Extract main content type
-            main_type = r.content_type.split(';')[0].strip().split('/')
+            main_type = content_type.split(';')[0].strip().split('/')
             if len(main_type) > 1:
                 main_type = f"{main_type[0]}/{main_type[1]}"
             else:
@@ -1424,11 +4390,61 @@ class SitemapValidator:
             xaxis_tickangle=-45
         )
         
-        return {
+        visualizations = {
             "status_distribution": status_fig,
             "response_times": time_fig,
             "content_types": content_fig
         }
+        
+        # Lastmod freshness histogram from the batch-parsed lastmod column
+        if analysis and analysis.metrics.get("lastmod_freshness"):
+            freshness = analysis.metrics["lastmod_freshness"]
+            freshness_fig = px.bar(
+                x=list(freshness.keys()),
+                y=list(freshness.values()),
+                title="Lastmod Freshness",
+                labels={"x": "Last Modified", "y": "URLs"},
+                color_discrete_sequence=["#10B981"],
+                template="plotly_dark"
+            )
+            
+            freshness_fig.update_layout(
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                font=dict(
+                    family="Inter, sans-serif",
+                    color="rgba(255,255,255,0.85)"
+                ),
+                margin=dict(t=40, b=40, l=40, r=20)
+            )
+            visualizations["lastmod_freshness"] = freshness_fig
+        
+        # Per-host concurrency chosen by the adaptive controller, in completion order
+        concurrency = pd.to_numeric(results.frame["concurrency"], errors="coerce")
+        if concurrency.notna().any():
+            hosts = results.frame["url"].map(HostScheduler.host)
+            concurrency_fig = px.line(
+                x=hosts.groupby(hosts).cumcount()[concurrency.notna()] + 1,
+                y=concurrency.dropna(),
+                color=hosts[concurrency.notna()],
+                title="Concurrency per Host",
+                labels={"x": "URLs Tested", "y": "Concurrent Requests", "color": "Host"},
+                line_shape="hv",
+                template="plotly_dark"
+            )
+            
+            concurrency_fig.update_layout(
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                font=dict(
+                    family="Inter, sans-serif",
+                    color="rgba(255,255,255,0.85)"
+                ),
+                margin=dict(t=40, b=40, l=40, r=20)
+            )
+            visualizations["concurrency"] = concurrency_fig
+        
+        return visualizations
 
     def detect_sitemaps(self, url: str) -> List[str]:
         """
@@ -1482,55 +4498,163 @@ class SitemapValidator:
 
     def check_robots_txt(self, url: str) -> Dict[str, Any]:
         """Check robots.txt file for a given URL and analyze its contents"""
+        robots = self.get_robots(url)
+        result = dict(robots["result"])
+        result["sitemap_declared"] = any(
+            url.strip() in sitemap.strip()
+            for sitemap in result["sitemaps"]
+        )
+        return result
+    
+    def get_robots(self, url: str) -> Dict[str, Any]:
+        """
+        Fetch and compile robots.txt for the origin of `url`
+        
+        Results are cached per origin for `robots_ttl` seconds, both in the
+        session and (for successful fetches) in the HTTP cache on disk.
+        """
+        parsed_url = urlparse(url)
+        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        cache = self.state["robots_cache"]
+        cached = cache.get(base_url)
+        if cached and time.time() - cached["fetched_at"] < self.state["robots_ttl"]:
+            return cached
+        
+        result = {
+            "found": False,
+            "sitemap_declared": False,
+            "sitemaps": [],
+            "content": None
+        }
+        rules = None
         try:
-            # Parse the URL to get the base domain
-            parsed_url = urlparse(url)
-            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            robots_url = f"{base_url}/robots.txt"
-            
-            # Fetch robots.txt
-            response = requests.get(
-                robots_url,
+            # Fetch robots.txt, revalidating any copy in the HTTP cache
+            response = self.http_cache.get(
+                f"{base_url}/robots.txt",
                 headers={"User-Agent": self.state["user_agent"]},
-                timeout=self.state["timeout"]
+                timeout=self.state["timeout"],
+                max_age=self.state["robots_ttl"]
             )
-            
-            result = {
-                "found": False,
-                "sitemap_declared": False,
-                "sitemaps": [],
-                "content": None,
-                "status_code": response.status_code
-            }
+            result["status_code"] = response.status_code
             
             if response.status_code == 200:
                 result["found"] = True
-                content = response.text
-                result["content"] = content
-                
-                # Look for Sitemap declarations
-                sitemaps = []
-                for line in content.splitlines():
-                    if line.lower().startswith(("sitemap:", "sitemap ")):
-                        sitemap_url = line.split(":", 1)[1].strip()
-                        sitemaps.append(sitemap_url)
-                
-                result["sitemaps"] = sitemaps
-                result["sitemap_declared"] = any(
-                    url.strip() in sitemap.strip() 
-                    for sitemap in sitemaps
-                )
-            
-            return result
-            
+                result["content"] = response.text
+                rules = RobotsRules.parse(response.text, self.state["user_agent"])
+                result["sitemaps"] = rules.sitemaps
+            elif response.status_code >= 500:
+                # RFC 9309: an unavailable robots.txt means nothing may be crawled
+                rules = RobotsRules(disallow_all=True)
+            else:
+                # 4xx: no restrictions
+                rules = RobotsRules()
         except Exception as e:
-            return {
-                "found": False,
-                "sitemap_declared": False,
-                "sitemaps": [],
-                "content": None,
-                "error": str(e)
-            }
+            result["error"] = str(e)
+        
+        cached = {"fetched_at": time.time(), "result": result, "rules": rules}
+        cache[base_url] = cached
+        return cached
+    
+    def flag_robots_blocked(self, urls: URLTable) -> int:
+        """Set `robots_blocked` on every URL disallowed by its host's robots.txt; returns the count"""
+        # Split "scheme://host/path?query#fragment" with plain string ops (much faster than a regex extract)
+        by_origin = {}
+        for position, url in enumerate(urls.frame["url"].tolist()):
+            if not isinstance(url, str):
+                continue
+            scheme, separator, rest = url.partition("://")
+            if not separator:
+                continue
+            host, _, path = rest.partition("/")
+            path = "/" + path.partition("#")[0]
+            positions, paths = by_origin.setdefault(f"{scheme}://{host}", ([], []))
+            positions.append(position)
+            paths.append(path)
+        
+        blocked = np.full(len(urls), None, dtype=object)
+        blocked_count = 0
+        for origin, (positions, paths) in by_origin.items():
+            rules = self.get_robots(origin)["rules"]
+            if rules is not None:
+                mask = rules.blocked(paths)
+                blocked[positions] = mask
+                blocked_count += int(mask.sum())
+        
+        urls.frame["robots_blocked"] = blocked
+        return blocked_count
+
+def job_owner() -> str:
+    """ID that scopes validation jobs to this browser; kept in the URL so it survives reloads"""
+    if "owner" not in st.query_params:
+        st.query_params["owner"] = uuid.uuid4().hex[:12]
+    return st.query_params["owner"]
+
+def store_validation_results(validator: SitemapValidator, job: ValidationJob, results: URLTable, reused: int = 0):
+    """Analyze the results of a finished job and make them the displayed validation results"""
+    urls_tested, sample_design = job.urls(), job.meta["sample_design"]
+    
+    # hreflang and canonical targets are looked up in the whole sitemap, if it's the one loaded in full
+    sitemap_urls = None
+    sitemap_data = st.session_state.sitemap_data
+    if job.meta.get("sitemap_url") == sitemap_data.get("sitemap_url") and sitemap_data.get("urls_complete", True):
+        sitemap_urls = sitemap_data.get("urls")
+    
+    # Generate analysis; a sample of a partly loaded sitemap says nothing about the rest of it
+    analysis = validator.analyze_sitemap_health(urls_tested, results, sitemap_urls)
+    if sample_design and job.meta.get("sitemap_complete", True):
+        analysis = validator.extrapolate_health(analysis, results, sample_design)
+    visualizations = validator.generate_visualizations(results, analysis)
+    
+    # Save to session state
+    messages = [("success", f"✅ Tested {len(results) - reused} URLs successfully! (job {job.job_id})")]
+    
+    # The results are stored now, so the job's logs are no longer needed
+    if job.meta["status"] == "complete":
+        job.delete()
+    if reused:
+        messages.append(("info", f"Reused {reused:,} results from the last {validator.state['freshness_hours']} hours"))
+    st.session_state.sitemap_data.update({
+        "validation_results": results,
+        "sample_design": sample_design,
+        "analysis": analysis,
+        "visualizations": visualizations,
+        "job_messages": messages
+    })
+
+@st.fragment(run_every=1)
+def render_background_jobs(validator: SitemapValidator):
+    """Poll this session's background jobs, showing progress until each one stops"""
+    runner = get_job_runner()
+    for job_id in list(st.session_state.background_jobs):
+        handle = runner.get(job_id)
+        if handle is None:
+            # The server restarted; the job can be resumed from its checkpoints
+            st.session_state.background_jobs.remove(job_id)
+            continue
+        
+        if handle.active:
+            label = "Queued" if handle.status == "queued" else "Testing"
+            st.progress(min(1.0, handle.tested / max(1, handle.total)), text=f"{label} job {job_id}: {handle.tested:,} of {handle.total:,} URLs")
+            if handle.tested:
+                counts = st.columns(5)
+                for column, group in zip(counts, ("2xx", "3xx", "4xx", "5xx", "error")):
+                    column.metric(group, f"{handle.status_counts[group]:,}")
+                st.dataframe(URLTable.from_urls(handle.recent).frame, height=200)
+            if st.button("⏹️ Cancel Job", key=f"cancel_{job_id}"):
+                runner.cancel(job_id)
+            continue
+        
+        # The job stopped: collect it and rerun the whole app to show the results
+        st.session_state.background_jobs.remove(job_id)
+        runner.forget(job_id)
+        if handle.status == "complete":
+            validator.state["host_stats"] = handle.host_stats
+            store_validation_results(validator, handle.job, handle.job.results(), handle.reused)
+        elif handle.status == "cancelled":
+            st.session_state.sitemap_data["job_messages"] = [("warning", f"Job {job_id} cancelled after {handle.tested:,} URLs; resume it from Interrupted Jobs")]
+        else:
+            st.session_state.sitemap_data["job_messages"] = [("error", f"Job {job_id} failed: {handle.error}")]
+        st.rerun()
 
 def main():
     st.set_page_config(
@@ -1598,11 +4722,96 @@ def main():
                 value=validator.state["concurrent_requests"]
             )
             
+            validator.state["rate_limit_rps"] = st.number_input(
+                "Requests / Second per Host",
+                min_value=0.0,
+                max_value=1000.0,
+                value=float(validator.state["rate_limit_rps"]),
+                help="Token-bucket limit applied to each host separately (0 = unlimited)"
+            )
+            
+            validator.state["limit_per_host"] = st.slider(
+                "Concurrent Requests per Host",
+                min_value=1,
+                max_value=20,
+                value=min(validator.state["limit_per_host"], 20),
+                help="Work is spread round-robin across hosts; no host gets more than this many requests at once"
+            )
+            
+            validator.state["adaptive_concurrency"] = st.checkbox(
+                "Adaptive Concurrency",
+                value=validator.state["adaptive_concurrency"],
+                help="Start each host at the limit above, raise it while latency stays flat and back off on 429/503, timeouts or rising latency (up to Concurrent Requests)"
+            )
+            
+            validator.state["rate_limit_burst"] = st.number_input(
+                "Burst per Host",
+                min_value=1,
+                max_value=100,
+                value=validator.state["rate_limit_burst"],
+                help="Requests a host may receive back to back before the rate limit applies"
+            )
+            
             validator.state["content_analysis"] = st.checkbox(
                 "Analyze Page Content",
                 value=validator.state["content_analysis"],
                 help="Extract and analyze HTML content from URLs"
             )
+            
+            if validator.state["content_analysis"]:
+                validator.state["head_bytes"] = st.number_input(
+                    "Content Read Limit (KB)",
+                    min_value=8,
+                    max_value=4096,
+                    value=validator.state["head_bytes"] // 1024,
+                    help="Pages are read until the <head> and first H1 are parsed, or up to this much HTML"
+                ) * 1024
+            
+            if validator.state["content_analysis"]:
+                validator.state["detect_duplicates"] = st.checkbox(
+                    "Detect Near-Duplicate Pages",
+                    value=validator.state["detect_duplicates"],
+                    help="Fingerprint page text (SimHash and MinHash) and cluster near-identical pages. Costs bandwidth: every page is read up to the Content Read Limit instead of stopping after the first H1"
+                )
+            
+            validator.state["check_hreflang"] = st.checkbox(
+                "Check hreflang Reciprocity",
+                value=validator.state["check_hreflang"],
+                help="Check that hreflang alternates are in the sitemap, list themselves and link back"
+            )
+            
+            if validator.state["content_analysis"]:
+                validator.state["check_canonical"] = st.checkbox(
+                    "Check Canonical Links",
+                    value=validator.state["check_canonical"],
+                    help="Flag pages whose canonical is another sitemap URL or a URL outside the sitemap"
+                )
+            
+            validator.state["max_body_bytes"] = st.number_input(
+                "Max Body Size (MB)",
+                min_value=1,
+                max_value=1024,
+                value=validator.state["max_body_bytes"] // (1024 * 1024),
+                help="Responses are never read past this size and are flagged as truncated"
+            ) * 1024 * 1024
+            
+            validator.state["measure_body_size"] = st.checkbox(
+                "Measure Size Without Content-Length",
+                value=validator.state["measure_body_size"],
+                help="Read bodies sent without a Content-Length header (up to Max Body Size) to measure them"
+            )
+            
+            validator.state["pipeline_mode"] = st.checkbox(
+                "Pipeline Mode",
+                value=validator.state["pipeline_mode"],
+                help="Test URLs while the sitemap is still loading (Load also runs validation, up to Max URLs to Check)"
+            )
+            
+            validator.state["run_in_background"] = st.checkbox(
+                "Run Tests in Background",
+                value=validator.state["run_in_background"],
+                help="Queue URL tests as background jobs so the app stays responsive; progress updates every second"
+            )
         
         with col2:
             validator.state["timeout"] = st.slider(
@@ -1617,6 +4826,61 @@ def main():
                 value=validator.state["follow_redirects"],
                 help="Follow URL redirects to final destination"
             )
+            
+            if validator.state["follow_redirects"]:
+                validator.state["max_redirects"] = st.number_input(
+                    "Max Redirect Hops",
+                    min_value=1,
+                    max_value=30,
+                    value=validator.state["max_redirects"]
+                )
+            
+            validator.state["retry_enabled"] = st.checkbox(
+                "Retry Transient Errors",
+                value=validator.state["retry_enabled"],
+                help="Retry timeouts, connection errors, 429 and 5xx responses with exponential backoff"
+            )
+            
+            if validator.state["retry_enabled"]:
+                validator.state["retry_budget"] = st.slider(
+                    "Retry Budget (% of URLs)",
+                    min_value=0,
+                    max_value=100,
+                    value=int(validator.state["retry_budget"] * 100),
+                    step=5,
+                    help="Cap on retries across the whole run, so failing hosts can't multiply the run time"
+                ) / 100
+            
+            probe_modes = {
+                "get": "GET",
+                "head": "HEAD only",
+                "head_fallback": "HEAD, GET if rejected",
+                "range": "GET first bytes (Range)"
+            }
+            validator.state["probe_mode"] = st.selectbox(
+                "Probe Mode",
+                options=list(probe_modes),
+                format_func=probe_modes.get,
+                index=list(probe_modes).index(validator.state["probe_mode"]),
+                help="HEAD modes skip response bodies for status-only audits (content analysis still uses GET); Range downloads just enough of each page for its <head>"
+            )
+            
+            if validator.state["probe_mode"] == "range":
+                validator.state["range_bytes"] = st.number_input(
+                    "Range Size (bytes)",
+                    min_value=1024,
+                    max_value=1024 * 1024,
+                    step=1024,
+                    value=validator.state["range_bytes"]
+                )
+            
+            validator.state["crawl_depth"] = st.number_input(
+                "Sitemap Index Depth",
+                min_value=1,
+                max_value=5,
+                value=validator.state["crawl_depth"],
+                help="How many levels of nested sitemap indexes to expand"
+            )
         
         with col3:
             validator.state["max_urls_to_check"] = st.number_input(
@@ -1632,6 +4896,41 @@ def main():
                 value=validator.state["check_ssl"],
                 help="Check for SSL certificate issues"
             )
+            
+            validator.state["parser_engine"] = st.selectbox(
+                "Sitemap Parser",
+                options=["streaming", "beautifulsoup"],
+                index=["streaming", "beautifulsoup"].index(validator.state["parser_engine"]),
+                help="Streaming parses large sitemaps with constant memory; BeautifulSoup is slower but tolerates malformed XML"
+            )
+            
+            validator.state["incremental_mode"] = st.checkbox(
+                "Incremental Validation",
+                value=validator.state["incremental_mode"],
+                help="Only retest URLs that are new, have a changed <lastmod>, or were last checked before the freshness window"
+            )
+            
+            if validator.state["incremental_mode"]:
+                validator.state["freshness_hours"] = st.number_input(
+                    "Freshness Window (hours)",
+                    min_value=1,
+                    max_value=24 * 30,
+                    value=validator.state["freshness_hours"]
+                )
+                
+                if st.button("🗑️ Forget Stored Results", help="Retest every URL on the next run"):
+                    validator.result_store.clear()
+                    st.success("Stored results cleared")
+            
+            if st.button("🗑️ Clear Cache", help="Forget cached sitemaps, parsed sitemaps, robots.txt files and interrupted jobs"):
+                validator.http_cache.clear()
+                validator.parsed_store.clear()
+                validator.state["robots_cache"].clear()
+                for meta in ValidationJob.list_jobs(validator.jobs_dir, job_owner()):
+                    job = ValidationJob(validator.jobs_dir, meta["job_id"])
+                    if job.lock():  # running jobs hold their lock
+                        job.delete()
+                st.success("Cache cleared")
     
     # Detect sitemaps
     if detect_button:
@@ -1661,12 +4960,12 @@ def main():
                         # Add a button to load the selected sitemap (non-recursive)
                         if st.button("Load Selected Sitemap Only", key="load_selected_only"):
                             with st.spinner("Loading selected sitemap only..."):
-                                sitemap_content, info = validator.load_sitemap(selected_sitemap)
+                                # Only load URLs from the current sitemap, not recursively
+                                urls, sitemap_info, info = validator.load_urls_from_sitemap(selected_sitemap, recursive=False)
                                 
-                                if info["status"] == "success" and sitemap_content:
-                                    # Only load URLs from the current sitemap, not recursively
-                                    urls, sitemap_info = validator.extract_urls_from_sitemap(sitemap_content, recursive=False)
+                                if info["status"] == "success":
                                     robots_txt_data = validator.check_robots_txt(selected_sitemap)
+                                    blocked_count = validator.flag_robots_blocked(urls)
                                     
                                     # Save to session state
                                     if 'sitemap_data' not in st.session_state:
@@ -1674,13 +4973,16 @@ def main():
                                         
                                     st.session_state.sitemap_data.update({
                                         "sitemap_url": selected_sitemap,
-                                        "sitemap_content": sitemap_content,
                                         "urls": urls,
+                                        "urls_complete": True,
                                         "sitemap_info": sitemap_info,
                                         "robots_txt_data": robots_txt_data
                                     })
                                     
                                     st.success(f"✅ Successfully loaded {len(urls)} URLs from selected sitemap")
+                                    if blocked_count:
+                                        st.warning(f"⚠️ {blocked_count} URLs in the sitemap are blocked by robots.txt")
+                                    validator.show_index_report(sitemap_info)
                                 else:
                                     st.error(f"❌ Failed to load sitemap: {info['message']}")
                     
@@ -1688,12 +4990,12 @@ def main():
                         # Add a button to load the selected sitemap recursively
                         if st.button("Load All Linked Sitemaps", key="load_all_linked"):
                             with st.spinner("Loading all linked sitemaps..."):
-                                sitemap_content, info = validator.load_sitemap(selected_sitemap)
+                                # Load URLs recursively from all linked sitemaps
+                                urls, sitemap_info, info = validator.load_urls_from_sitemap(selected_sitemap, recursive=True)
                                 
-                                if info["status"] == "success" and sitemap_content:
-                                    # Load URLs recursively from all linked sitemaps
-                                    urls, sitemap_info = validator.extract_urls_from_sitemap(sitemap_content, recursive=True)
+                                if info["status"] == "success":
                                     robots_txt_data = validator.check_robots_txt(selected_sitemap)
+                                    blocked_count = validator.flag_robots_blocked(urls)
                                     
                                     # Save to session state
                                     if 'sitemap_data' not in st.session_state:
@@ -1701,29 +5003,72 @@ def main():
                                         
                                     st.session_state.sitemap_data.update({
                                         "sitemap_url": selected_sitemap,
-                                        "sitemap_content": sitemap_content,
                                         "urls": urls,
+                                        "urls_complete": True,
                                         "sitemap_info": sitemap_info,
                                         "robots_txt_data": robots_txt_data
                                     })
                                     
                                     st.success(f"✅ Successfully loaded {len(urls)} URLs from all linked sitemaps")
+                                    if blocked_count:
+                                        st.warning(f"⚠️ {blocked_count} URLs in the sitemap are blocked by robots.txt")
+                                    validator.show_index_report(sitemap_info)
                                 else:
                                     st.error(f"❌ Failed to load sitemap: {info['message']}")
                 else:
                     st.warning("No sitemaps found. Try entering a sitemap URL manually.")
     
     # Load sitemap
-    if load_button:
+    if load_button and validator.state["pipeline_mode"]:
+        if not sitemap_url:
+            st.warning("Please enter a sitemap URL")
+        else:
+            progress = st.empty()
+            with st.spinner("Loading sitemap and testing URLs..."):
+                results, sitemap_info, info = validator.run_pipeline(
+                    sitemap_url,
+                    progress_callback=lambda tested, queued: progress.caption(f"Tested {tested:,} of {queued:,} URLs found so far")
+                )
+                progress.empty()
+                
+                if info["status"] == "success":
+                    robots_txt_data = validator.check_robots_txt(sitemap_url)
+                    blocked_count = validator.flag_robots_blocked(results)
+                    # A sitemap cut off at max_urls_to_check can't tell which targets are outside it
+                    analysis = validator.analyze_sitemap_health(results, results, results if info.get("complete") else None)
+                    visualizations = validator.generate_visualizations(results, analysis)
+                    
+                    if 'sitemap_data' not in st.session_state:
+                        st.session_state.sitemap_data = {}
+                    
+                    st.session_state.sitemap_data.update({
+                        "sitemap_url": sitemap_url,
+                        "urls": results,
+                        "urls_complete": info.get("complete", True),  # False when loading stopped at max_urls_to_check
+                        "sitemap_info": sitemap_info,
+                        "robots_txt_data": robots_txt_data,
+                        "validation_results": results,
+                        "sample_design": None,
+                        "analysis": analysis,
+                        "visualizations": visualizations
+                    })
+                    
+                    st.success(f"✅ Loaded and tested {len(results)} URLs from sitemap")
+                    if blocked_count:
+                        st.warning(f"⚠️ {blocked_count} URLs in the sitemap are blocked by robots.txt")
+                    validator.show_index_report(sitemap_info)
+                else:
+                    st.error(f"❌ Failed to load sitemap: {info['message']}")
+    elif load_button:
         if not sitemap_url:
             st.warning("Please enter a sitemap URL")
         else:
             with st.spinner("Loading and parsing sitemap..."):
-                sitemap_content, info = validator.load_sitemap(sitemap_url)
+                urls, sitemap_info, info = validator.load_urls_from_sitemap(sitemap_url)
                 
-                if info["status"] == "success" and sitemap_content:
-                    urls, sitemap_info = validator.extract_urls_from_sitemap(sitemap_content)
+                if info["status"] == "success":
                     robots_txt_data = validator.check_robots_txt(sitemap_url)
+                    blocked_count = validator.flag_robots_blocked(urls)
                     
                     # Save to session state
                     if 'sitemap_data' not in st.session_state:
@@ -1731,13 +5076,18 @@ def main():
                         
                     st.session_state.sitemap_data.update({
                         "sitemap_url": sitemap_url,
-                        "sitemap_content": sitemap_content,
                         "urls": urls,
+                        "urls_complete": True,
                         "sitemap_info": sitemap_info,
                         "robots_txt_data": robots_txt_data
                     })
                     
                     st.success(f"✅ Successfully loaded {len(urls)} URLs from sitemap")
+                    if blocked_count:
+                        st.warning(f"⚠️ {blocked_count} URLs in the sitemap are blocked by robots.txt")
+                    validator.show_index_report(sitemap_info)
+                    if sitemap_info.compression == "gzip":
+                        st.caption(f"Gzip sitemap: {sitemap_info.compressed_size / 1024:,.1f} KB transferred, {sitemap_info.size / 1024:,.1f} KB decompressed")
                 else:
                     st.error(f"❌ Failed to load sitemap: {info['message']}")
     
@@ -1753,6 +5103,7 @@ def main():
         ])
         
         urls = st.session_state.sitemap_data["urls"]
+        urls_complete = st.session_state.sitemap_data.get("urls_complete", True)
         
         with tab1:
             st.subheader("Dashboard")
@@ -1766,13 +5117,13 @@ def main():
                     <div style="color: {THEME['colors']['primary']}">
                         {validator.icon('globe', THEME['colors']['primary'])}
                     </div>
-                    <div class="stat-card-value">{len(urls)}</div>
-                    <div class="stat-card-label">Total URLs</div>
+                    <div class="stat-card-value">{len(urls)}{"" if urls_complete else "+"}</div>
+                    <div class="stat-card-label">{"Total URLs" if urls_complete else "URLs Loaded (sitemap cut off)"}</div>
                 </div>
                 """, unsafe_allow_html=True)
             
             with col2:
-                total_images = sum(len(url.images) for url in urls)
+                total_images = int(urls.list_lengths("images").sum())
                 st.markdown(f"""
                 <div class="stat-card">
                     <div style="color: {THEME['colors']['success']}">
@@ -1784,7 +5135,7 @@ def main():
                 """, unsafe_allow_html=True)
             
             with col3:
-                total_videos = sum(len(url.videos) for url in urls)
+                total_videos = int(urls.list_lengths("videos").sum())
                 st.markdown(f"""
                 <div class="stat-card">
                     <div style="color: {THEME['colors']['warning']}">
@@ -1796,7 +5147,7 @@ def main():
                 """, unsafe_allow_html=True)
             
             with col4:
-                total_alternates = sum(len(url.alternates) for url in urls)
+                total_alternates = int(urls.list_lengths("alternates").sum())
                 st.markdown(f"""
                 <div class="stat-card">
                     <div style="color: {THEME['colors']['secondary']}">
@@ -1877,8 +5228,8 @@ def main():
             # Filter options
             search = st.text_input("🔍 Filter URLs", placeholder="Type to search...")
             
-            # Create DataFrame for display
-            df = pd.DataFrame([url.to_dict() for url in urls])
+            # Display the shared URL table directly
+            df = urls.frame
             
             # Apply filters
             if search:
@@ -1889,26 +5240,103 @@ def main():
         with tab2:
             st.subheader("URL Validation")
             
-            if st.button("🚀 Test URLs"):
-                with st.spinner("Testing URLs..."):
+            if len(urls) > validator.state["max_urls_to_check"]:
+                with st.expander(f"🎯 Sampling ({len(urls):,} URLs, testing {validator.state['max_urls_to_check']:,})"):
+                    scol1, scol2 = st.columns(2)
+                    with scol1:
+                        validator.state["sample_strategy"] = st.radio(
+                            "URLs to Test",
+                            options=["stratified", "first"],
+                            format_func=lambda option: "Stratified sample" if option == "stratified" else "First URLs in the sitemap",
+                            index=["stratified", "first"].index(validator.state["sample_strategy"])
+                        )
+                        validator.state["sample_strata"] = st.multiselect(
+                            "Stratify By",
+                            options=list(StratifiedSampler.STRATA),
+                            default=validator.state["sample_strata"],
+                            format_func={"sitemap": "Child sitemap", "host": "Host", "path": "Path prefix"}.get
+                        )
+                    with scol2:
+                        validator.state["sample_weighting"] = st.selectbox(
+                            "Weight By",
+                            options=["none", "priority", "lastmod"],
+                            format_func={"none": "Uniform", "priority": "<priority>", "lastmod": "<lastmod> recency"}.get,
+                            index=["none", "priority", "lastmod"].index(validator.state["sample_weighting"])
+                        )
+                        validator.state["sample_seed"] = int(st.number_input(
+                            "Random Seed",
+                            min_value=0,
+                            value=validator.state["sample_seed"],
+                            help="The same seed and settings always select the same URLs"
+                        ))
+                        if "path" in validator.state["sample_strata"]:
+                            validator.state["sample_path_depth"] = st.number_input(
+                                "Path Prefix Segments",
+                                min_value=1,
+                                max_value=5,
+                                value=validator.state["sample_path_depth"]
+                            )
+            
+            # Jobs interrupted by a rerun or restart can pick up where they stopped
+            runner = get_job_runner()
+            resume_job = None
+            unfinished = [
+                job for job in ValidationJob.list_jobs(validator.jobs_dir, job_owner())
+                if job["status"] != "complete" and not (runner.get(job["job_id"]) and runner.get(job["job_id"]).active)
+            ]
+            if unfinished:
+                with st.expander(f"♻️ Interrupted Jobs ({len(unfinished)})"):
+                    jobs_by_id = {job["job_id"]: job for job in unfinished}
+                    job_id = st.selectbox(
+                        "Job",
+                        options=list(jobs_by_id),
+                        format_func=lambda job_id: (
+                            f"{job_id} · {jobs_by_id[job_id]['sitemap_url'] or 'unknown sitemap'} · "
+                            f"{jobs_by_id[job_id]['completed']:,}/{jobs_by_id[job_id]['total']:,} URLs · "
+                            f"started {jobs_by_id[job_id]['created_at'][:16].replace('T', ' ')}"
+                        )
+                    )
+                    col1, col2 = st.columns(2)
+                    if col1.button("▶️ Resume Job"):
+                        resume_job = ValidationJob(validator.jobs_dir, job_id)
+                        if not resume_job.lock():
+                            st.error(f"Job {job_id} is already running in another session")
+                            resume_job = None
+                    if col2.button("🗑️ Discard Job"):
+                        discarded = ValidationJob(validator.jobs_dir, job_id)
+                        if discarded.lock():
+                            discarded.delete()
+                            st.rerun()
+                        st.error(f"Job {job_id} is running in another session")
+            
+            if st.button("🚀 Test URLs") or resume_job:
+                if resume_job:
+                    job = resume_job
+                else:
                     # Limit the number of URLs to test if needed
-                    urls_to_test = urls[:validator.state["max_urls_to_check"]]
-                    
-                    # Test URLs
-                    results = validator.test_urls(urls_to_test)
-                    
-                    # Generate analysis
-                    analysis = validator.analyze_sitemap_health(urls_to_test, results)
-                    visualizations = validator.generate_visualizations(results)
-                    
-                    # Save to session state
-                    st.session_state.sitemap_data.update({
-                        "validation_results": results,
-                        "analysis": analysis,
-                        "visualizations": visualizations
-                    })
-                    
-                    st.success(f"✅ Tested {len(results)} URLs successfully!")
+                    urls_to_test, sample_design = validator.sample_urls(urls, validator.state["max_urls_to_check"])
+                    job = validator.create_job(
+                        urls_to_test,
+                        st.session_state.sitemap_data.get("sitemap_url"),
+                        sample_design,
+                        job_owner(),
+                        st.session_state.sitemap_data.get("urls_complete", True)
+                    )
+                
+                if validator.state["run_in_background"]:
+                    runner.submit(validator, job)
+                    st.session_state.setdefault("background_jobs", []).append(job.job_id)
+                else:
+                    with st.spinner("Testing URLs..."):
+                        # Test URLs, checkpointing results so the job can be resumed
+                        results, reused = validator.run_job(job)
+                        store_validation_results(validator, job, results, reused)
+            
+            if st.session_state.get("background_jobs"):
+                render_background_jobs(validator)
+            
+            for kind, message in st.session_state.sitemap_data.pop("job_messages", []):
+                getattr(st, kind)(message)
             
             # Show results if available
             if st.session_state.sitemap_data.get("validation_results"):
@@ -1917,13 +5345,7 @@ def main():
                 # Status summary
                 col1, col2, col3, col4, col5 = st.columns(5)
                 
-                status_counts = {
-                    "2xx": sum(1 for r in results if r.status_group == "2xx"),
-                    "3xx": sum(1 for r in results if r.status_group == "3xx"),
-                    "4xx": sum(1 for r in results if r.status_group == "4xx"),
-                    "5xx": sum(1 for r in results if r.status_group == "5xx"),
-                    "error": sum(1 for r in results if r.status_group == "error")
-                }
+                status_counts = results.status_counts()
                 
                 with col1:
                     st.markdown(f"""
@@ -1970,11 +5392,70 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
                 
+                # Sample-based estimates for the whole sitemap
+                extrapolated = st.session_state.sitemap_data["analysis"].metrics.get("extrapolated")
+                if extrapolated:
+                    st.subheader("Estimated Across the Whole Sitemap")
+                    st.caption(
+                        f"Stratified sample of {extrapolated['sample_size']:,} out of {extrapolated['population']:,} URLs, "
+                        f"{extrapolated['confidence']:.0%} confidence intervals, strata covering {extrapolated['coverage']:.1%} of URLs"
+                    )
+                    labels = {
+                        "success_count": "Success (2xx)",
+                        "redirect_count": "Redirects (3xx)",
+                        "error_count": "Errors",
+                        "old_urls": "Lastmod older than 6 months",
+                        "invalid_lastmod_count": "Invalid lastmod",
+                        "missing_lastmod_count": "Missing lastmod",
+                        "avg_response_time": "Avg response time (ms)"
+                    }
+                    st.dataframe(pd.DataFrame([
+                        {"Metric": labels[name], "Estimate": values["estimate"], "Lower": values["ci_low"], "Upper": values["ci_high"]}
+                        for name, values in extrapolated["metrics"].items()
+                    ]), hide_index=True)
+                
+                host_stats = validator.state["host_stats"]
+                if len(host_stats) > 1:
+                    with st.expander(f"🌐 Requests per Host ({len(host_stats)} hosts)"):
+                        st.dataframe(pd.DataFrame.from_dict(host_stats, orient="index")[["completed", "concurrency"]])
+                
+                duplicates = st.session_state.sitemap_data["analysis"].duplicates
+                if duplicates.get("clusters"):
+                    with st.expander(f"🧬 Near-Duplicate Pages ({duplicates['cluster_count']} clusters, {duplicates['duplicate_urls']} redundant URLs)"):
+                        for cluster in duplicates["clusters"]:
+                            st.markdown(f"**{cluster['size']} pages**")
+                            st.dataframe(pd.DataFrame({"url": cluster["urls"]}), hide_index=True)
+                
+                structure = st.session_state.sitemap_data["analysis"].structure
+                hreflang, canonical = structure.get("hreflang"), structure.get("canonical")
+                if (hreflang and hreflang["urls_with_alternates"]) or (canonical and canonical["with_canonical"]):
+                    with st.expander("🌍 hreflang & Canonicals"):
+                        if not ((hreflang or {}).get("complete", True) and (canonical or {}).get("complete", True)):
+                            st.caption("Only part of the sitemap was loaded, so targets outside the tested URLs weren't checked")
+                        if hreflang and hreflang["urls_with_alternates"]:
+                            col1, col2, col3 = st.columns(3)
+                            col1.metric("Missing Return Links", hreflang["missing_return_link"])
+                            col2.metric("Missing Self-References", hreflang["missing_self_reference"])
+                            col3.metric("Alternates Not in Sitemap", hreflang["not_in_sitemap"])
+                            for problem, samples in hreflang["samples"].items():
+                                if samples:
+                                    st.caption(problem.replace("_", " ").capitalize())
+                                    st.dataframe(pd.DataFrame(samples), hide_index=True)
+                        if canonical and canonical["with_canonical"]:
+                            col1, col2, col3 = st.columns(3)
+                            col1.metric("Canonical to Another Sitemap URL", canonical["canonicalized"])
+                            col2.metric("Canonical Outside Sitemap", canonical["outside_sitemap"])
+                            col3.metric("Canonical Chains", canonical["chains"])
+                            for problem, samples in canonical["samples"].items():
+                                if samples:
+                                    st.caption(problem.replace("_", " ").capitalize())
+                                    st.dataframe(pd.DataFrame(samples), hide_index=True)
+                
                 # Results table with filtering
                 st.subheader("Detailed Results")
                 
-                # Create DataFrame
-                results_df = pd.DataFrame([r.to_dict() for r in results])
+                # Results are already columnar
+                results_df = results.frame
                 
                 # Add filters
                 col1, col2, col3 = st.columns(3)
@@ -1990,10 +5471,14 @@ def main():
                     content_filter = st.text_input("Filter by Content Type")
                 
                 # Apply filters
-                filtered_df = results_df.copy()
+                filtered_df = results_df
                 if status_filter:
                     filtered_df = filtered_df[filtered_df["status_group"].isin(status_filter)]
-                filtered_df = filtered_df[filtered_df["response_time"] >= min_time]
+                if min_time > 0:
+                    # Stored results merged in by incremental runs can leave the column as objects with gaps;
+                    # URLs without a response time can't meet a minimum, so they are filtered out
+                    response_times = pd.to_numeric(filtered_df["response_time"], errors="coerce")
+                    filtered_df = filtered_df[response_times.notna() & (response_times >= min_time)]
                 if content_filter:
                     filtered_df = filtered_df[filtered_df["content_type"].str.contains(content_filter, case=False, na=False)]
                 
@@ -2025,6 +5510,12 @@ def main():
                     st.plotly_chart(visualizations["response_times"], use_container_width=True)
                 
                 st.plotly_chart(visualizations["content_types"], use_container_width=True)
+                
+                if "lastmod_freshness" in visualizations:
+                    st.plotly_chart(visualizations["lastmod_freshness"], use_container_width=True)
+                
+                if "concurrency" in visualizations:
+                    st.plotly_chart(visualizations["concurrency"], use_container_width=True)
             else:
                 st.info("Run URL testing to see visualizations")
         
@@ -2070,6 +5561,11 @@ def main():
                         for sitemap in robots_data["sitemaps"]:
                             st.markdown(f"- `{sitemap}`")
                     
+                    blocked_urls = urls.frame[urls.frame["robots_blocked"].eq(True)]
+                    if len(blocked_urls):
+                        st.subheader(f"Sitemap URLs Blocked by robots.txt ({len(blocked_urls):,})")
+                        st.dataframe(blocked_urls[["url", "source_sitemap"]].head(1000), hide_index=True)
+                    
                     if robots_data["content"]:
                         st.subheader("robots.txt Content")
                         st.code(robots_data["content"], language="text")